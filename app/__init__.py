@@ -10,6 +10,10 @@ def create_app(config_class=Config):
     from app.utils import db
     db.init_app(app)
 
+    # Initialize response cache for the polled read APIs
+    from app.utils import response_cache
+    response_cache.init_app(app)
+
     # Register blueprints
     from app.blueprints.auth import auth_bp
     from app.blueprints.upload import upload_bp
@@ -25,6 +29,15 @@ def create_app(config_class=Config):
     app.register_blueprint(statistics_bp, url_prefix='/statistics')
     app.register_blueprint(admin_bp, url_prefix='/admin')
 
+    # Create the Gemini model up front so the first upload doesn't pay for it
+    if app.config['GEMINI_WARMUP']:
+        from app.utils.gemini_extractor import warm_up
+        try:
+            warm_up()
+        except Exception as e:
+            import logging
+            logging.warning(f"Gemini warm-up failed, will retry on first use: {e}")
+
     # Health check endpoint
     @app.route('/health')
     def health():
@@ -1,7 +1,14 @@
 from flask import render_template, request, redirect, url_for, flash, jsonify, session
+from postgrest.exceptions import APIError
 from app.blueprints.admin import admin_bp
 from app.utils.auth import admin_required, hash_password
 from app.utils.db import get_db
+from app.utils.response_cache import bump_data_version
+from app.utils.issue_types import get_issue_types, invalidate_issue_types
+
+
+# PostgreSQL error code of a unique constraint violation
+UNIQUE_VIOLATION = '23505'
 
 
 @admin_bp.route('/users')
@@ -166,9 +173,7 @@ def delete_user(user_id):
 def issue_types():
     """Issue type management page"""
     try:
-        db = get_db()
-        result = db.table('issue_types').select('id, name, active, created_at').order('name').execute()
-        issue_types = result.data
+        issue_types = get_issue_types()
     except Exception as e:
         flash(f'Error loading issue types: {str(e)}', 'error')
         issue_types = []
@@ -192,7 +197,8 @@ def add_issue_type():
         try:
             db = get_db()
 
-            # Check if name already exists
+            # Check if name already exists (in the database; the issue type
+            # cache of this process may not have another worker's changes yet)
             existing = db.table('issue_types').select('id').eq('name', name).execute()
             if existing.data:
                 flash('An issue type with this name already exists.', 'error')
@@ -203,10 +209,20 @@ def add_issue_type():
                 'name': name,
                 'active': active
             }).execute()
+            invalidate_issue_types()
+            bump_data_version()
 
             flash('Issue type created successfully!', 'success')
             return redirect(url_for('admin.issue_types'))
 
+        except APIError as e:
+            # Another admin saved the same name between the check and the insert
+            if e.code == UNIQUE_VIOLATION:
+                flash('An issue type with this name already exists.', 'error')
+            else:
+                flash(f'Error creating issue type: {str(e)}', 'error')
+            return render_template('issue_type_form.html', action='Add', issue_type={'name': name, 'active': active})
+
         except Exception as e:
             flash(f'Error creating issue type: {str(e)}', 'error')
             return render_template('issue_type_form.html', action='Add', issue_type={'name': name, 'active': active})
@@ -221,7 +237,7 @@ def edit_issue_type(type_id):
     try:
         db = get_db()
 
-        # Fetch issue type from database
+        # Read from the database rather than the per-process cache, which may be stale
         result = db.table('issue_types').select('*').eq('id', type_id).execute()
         if not result.data:
             flash('Issue type not found.', 'error')
@@ -245,10 +261,18 @@ def edit_issue_type(type_id):
                 return render_template('issue_type_form.html', issue_type={'id': type_id, 'name': name, 'active': active}, action='Edit')
 
             # Update issue type data
-            db.table('issue_types').update({
-                'name': name,
-                'active': active
-            }).eq('id', type_id).execute()
+            try:
+                db.table('issue_types').update({
+                    'name': name,
+                    'active': active
+                }).eq('id', type_id).execute()
+            except APIError as e:
+                if e.code != UNIQUE_VIOLATION:
+                    raise
+                flash('An issue type with this name already exists.', 'error')
+                return render_template('issue_type_form.html', issue_type={'id': type_id, 'name': name, 'active': active}, action='Edit')
+            invalidate_issue_types()
+            bump_data_version()
 
             flash('Issue type updated successfully!', 'success')
             return redirect(url_for('admin.issue_types'))
@@ -281,6 +305,8 @@ def delete_issue_type(type_id):
 
         # Delete issue type
         db.table('issue_types').delete().eq('id', type_id).execute()
+        invalidate_issue_types()
+        bump_data_version()
 
         flash('Issue type deleted successfully!', 'success')
     except Exception as e:
@@ -4,12 +4,23 @@ from app.utils.db import get_db
 from app.utils.auth import hash_password, verify_password
 
 
+# Set once users have been seen. Admins can't delete their own account, so the last
+# user is never removed and this process doesn't need to ask the database again
+_setup_completed = False
+
+
 def check_if_setup_needed():
     """Check if any users exist in the database"""
+    global _setup_completed
+    if _setup_completed:
+        return False
+
     try:
         db = get_db()
-        result = db.table('users').select('id', count='exact').execute()
-        return result.count == 0
+        result = db.table('users').select('id').limit(1).execute()
+        if result.data:
+            _setup_completed = True
+        return not result.data
     except Exception as e:
         # If table doesn't exist yet, setup is needed
         return True
@@ -18,6 +29,8 @@ def check_if_setup_needed():
 @auth_bp.route('/setup', methods=['GET', 'POST'])
 def setup():
     """First-time setup - create initial admin user"""
+    global _setup_completed
+
     # Check if setup is needed
     if not check_if_setup_needed():
         flash('Setup has already been completed.', 'info')
@@ -53,6 +66,8 @@ def setup():
                 'active': True
             }).execute()
 
+            _setup_completed = True
+
             flash('Admin account created successfully! Please log in.', 'success')
             return redirect(url_for('auth.login'))
 
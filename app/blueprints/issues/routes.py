@@ -1,9 +1,11 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, current_app, Response, stream_with_context
 from app.blueprints.issues import issues_bp
 from app.utils.auth import login_required
 from app.utils.db import get_db
-import csv
-from io import StringIO
+from app.utils.response_cache import bump_data_version
+from app.utils.issue_types import get_issue_type_names, find_issue_type_ids
+from app.utils.issue_export import parse_issue_filters, EXPORT_FORMATS
+from app.utils.repository import get_repository, LIST_SORT_COLUMNS
 
 
 @issues_bp.route('/')
@@ -13,39 +15,77 @@ def index():
     return render_template('issues/issues_list.html')
 
 
+# Upper bound on rows per DataTables page, so length=-1 can't pull the whole table
+MAX_PAGE_LENGTH = 500
+
+# Upper bound on results of a nearby lookup
+MAX_NEARBY_RESULTS = 100
+
+
+def _datatables_order(args):
+    """
+    Map DataTables' order[0][column]/order[0][dir] params to a sort column.
+
+    Returns:
+        tuple: (column, desc) with column one of LIST_SORT_COLUMNS
+    """
+    column_index = args.get('order[0][column]', type=int)
+    direction = args.get('order[0][dir]', 'desc')
+    column_name = args.get(f'columns[{column_index}][data]') if column_index is not None else None
+
+    column = column_name if column_name in LIST_SORT_COLUMNS else 'id'
+    return column, direction != 'asc'
+
+
 @issues_bp.route('/api/list')
 @login_required
 def get_issues():
-    """API endpoint for datatable - supports sorting, filtering, pagination"""
+    """API endpoint for datatable - server-side sorting, searching and pagination"""
     try:
-        db = get_db()
-
-        # Fetch all issues with their type names
-        query = db.table('issues').select('id, latitude, longitude, timestamp, image_url, extraction_error, issue_types(name)')
-
-        # Order by newest first
-        query = query.order('created_at', desc=True)
-
-        result = query.execute()
-        issues_data = result.data
+        draw = request.args.get('draw', type=int, default=1)
+        start = max(request.args.get('start', type=int, default=0), 0)
+        length = request.args.get('length', type=int, default=MAX_PAGE_LENGTH)
+        if length is None or length <= 0 or length > MAX_PAGE_LENGTH:
+            length = MAX_PAGE_LENGTH
+        search = request.args.get('search[value]', '').strip()
+
+        # The search box matches type names (resolved from the cached issue
+        # types) and the issue ID when the term is a number
+        search_type_ids = None
+        search_id = None
+        if search:
+            search_type_ids = find_issue_type_ids(search)
+            search_id = int(search) if search.isdigit() else None
+
+        column, desc = _datatables_order(request.args)
+        page = get_repository().list_issues(
+            start, length,
+            sort=column,
+            desc=desc,
+            search_type_ids=search_type_ids,
+            search_id=search_id,
+            count_mode=current_app.config['ISSUES_LIST_COUNT']
+        )
 
         # Format data for datatable
+        type_names = get_issue_type_names()
         formatted_issues = []
-        for issue in issues_data:
+        for issue in page['rows']:
             formatted_issues.append({
                 'id': issue['id'],
-                'type': issue['issue_types']['name'] if issue.get('issue_types') else 'Unknown',
+                'type': type_names.get(issue['issue_type_id'], 'Unknown'),
                 'latitude': issue['latitude'],
                 'longitude': issue['longitude'],
                 'timestamp': issue['timestamp'],
                 'extraction_error': issue['extraction_error'],
-                'image_url': issue['image_url']
+                'image_url': issue['image_url'],
+                'thumbnail_url': issue['thumbnail_url'] or issue['image_url']
             })
 
         return jsonify({
-            'draw': request.args.get('draw', type=int, default=1),
-            'recordsTotal': len(formatted_issues),
-            'recordsFiltered': len(formatted_issues),
+            'draw': draw,
+            'recordsTotal': page['total'],
+            'recordsFiltered': page['filtered'],
             'data': formatted_issues
         })
 
@@ -56,6 +96,47 @@ def get_issues():
         return jsonify({'error': str(e)}), 500
 
 
+@issues_bp.route('/api/nearby')
+@login_required
+def nearby():
+    """
+    API endpoint for issues near a point, nearest first.
+
+    Query params: lat, lng, radius (metres, optional), limit, issue_type.
+    """
+    try:
+        lat = request.args.get('lat', type=float)
+        lng = request.args.get('lng', type=float)
+        if lat is None or lng is None:
+            return jsonify({'error': 'lat and lng are required'}), 400
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            return jsonify({'error': 'lat/lng out of range'}), 400
+
+        radius = request.args.get('radius', type=float)
+        limit = min(max(request.args.get('limit', type=int, default=20), 1), MAX_NEARBY_RESULTS)
+        issue_type_id = request.args.get('issue_type', type=int)
+
+        rows = get_repository().nearby(lat, lng, radius_m=radius, limit=limit, issue_type_id=issue_type_id)
+
+        type_names = get_issue_type_names()
+        return jsonify([{
+            'id': row['id'],
+            'type': type_names.get(row['issue_type_id'], 'Unknown'),
+            'lat': float(row['latitude']),
+            'lng': float(row['longitude']),
+            'timestamp': row['timestamp'],
+            'image_url': row['image_url'],
+            'thumbnail_url': row['thumbnail_url'] or row['image_url'],
+            'distance_m': round(row['distance_m'], 1)
+        } for row in rows])
+
+    except Exception as e:
+        print(f"Error fetching nearby issues: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+
 @issues_bp.route('/<int:issue_id>')
 @login_required
 def detail(issue_id):
@@ -63,15 +144,14 @@ def detail(issue_id):
     try:
         db = get_db()
 
-        # Fetch issue with type name
-        result = db.table('issues').select('*, issue_types(name)').eq('id', issue_id).execute()
+        result = db.table('issues').select('*').eq('id', issue_id).execute()
 
         if not result.data:
             flash('Issue not found', 'error')
             return redirect(url_for('issues.index'))
 
         issue = result.data[0]
-        issue['type'] = issue['issue_types']['name'] if issue.get('issue_types') else 'Unknown'
+        issue['type'] = get_issue_type_names().get(issue['issue_type_id'], 'Unknown')
 
         return render_template('issues/issue_detail.html', issue=issue)
 
@@ -92,6 +172,7 @@ def delete(issue_id):
 
         # Delete the issue
         db.table('issues').delete().eq('id', issue_id).execute()
+        bump_data_version()
 
         flash('Issue deleted successfully!', 'success')
         return redirect(url_for('issues.index'))
@@ -107,42 +188,45 @@ def delete(issue_id):
 @issues_bp.route('/export')
 @login_required
 def export():
-    """Export issues to CSV"""
-    try:
-        db = get_db()
-
-        # Fetch all issues
-        result = db.table('issues').select('id, latitude, longitude, timestamp, issue_types(name)').order('created_at', desc=True).execute()
-        issues_data = result.data
-
-        # Format for CSV
-        csv_data = []
-        for issue in issues_data:
-            csv_data.append({
-                'id': issue['id'],
-                'type': issue['issue_types']['name'] if issue.get('issue_types') else 'Unknown',
-                'latitude': issue['latitude'],
-                'longitude': issue['longitude'],
-                'timestamp': issue['timestamp']
-            })
-
-        # Create CSV
-        output = StringIO()
-        writer = csv.DictWriter(output, fieldnames=['id', 'type', 'latitude', 'longitude', 'timestamp'])
-        writer.writeheader()
-        writer.writerows(csv_data)
+    """
+    Export issues as CSV, GeoJSON, NDJSON or Parquet (?format=, default csv).
+
+    Accepts the map's filters (issue_type, date_from, date_to). Rows are
+    streamed page by page, so the export is never held in memory as a whole.
+    """
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in EXPORT_FORMATS:
+        flash(f'Unsupported export format: {export_format}', 'error')
+        return redirect(url_for('issues.index'))
 
-        # Create response
-        from flask import make_response
-        response = make_response(output.getvalue())
-        response.headers['Content-Disposition'] = 'attachment; filename=issues_export.csv'
-        response.headers['Content-Type'] = 'text/csv'
+    try:
+        filters = parse_issue_filters(request.args)
+    except ValueError:
+        flash('Invalid export filters', 'error')
+        return redirect(url_for('issues.index'))
 
-        return response
+    if export_format == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            flash('Parquet export requires pyarrow to be installed', 'error')
+            return redirect(url_for('issues.index'))
 
-    except Exception as e:
-        print(f"Error exporting issues: {e}")
-        import traceback
-        traceback.print_exc()
-        flash('Error exporting issues', 'error')
-        return redirect(url_for('issues.index'))
+    generator, mimetype, extension = EXPORT_FORMATS[export_format]
+    page_size = current_app.config['EXPORT_PAGE_SIZE']
+
+    def generate():
+        try:
+            yield from generator(filters, page_size)
+        except Exception as e:
+            # Headers are already sent. Re-raising makes the server drop the
+            # connection before the final chunk, so the client sees a failed
+            # download instead of a truncated file that looks complete.
+            print(f"Error exporting issues: {e}")
+            import traceback
+            traceback.print_exc()
+            raise
+
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=issues_export.{extension}'
+    return response
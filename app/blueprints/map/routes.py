@@ -1,7 +1,10 @@
-from flask import render_template, request, jsonify
+from flask import render_template, request, jsonify, current_app, Response
 from app.blueprints.map import map_bp
 from app.utils.auth import login_required
-from app.utils.db import get_db
+from app.utils.response_cache import cached_response, get_data_version
+from app.utils.issue_types import get_issue_types, get_issue_type_names
+from app.utils.issue_export import parse_issue_filters
+from app.utils.repository import get_repository
 
 
 @map_bp.route('/')
@@ -10,47 +13,101 @@ def index():
     """Map view displaying reported issues with markers and filters"""
     # Fetch issue types for the filter dropdown
     try:
-        db = get_db()
-        result = db.table('issue_types').select('id, name').eq('active', True).order('name').execute()
-        issue_types = result.data
+        issue_types = get_issue_types(active_only=True)
     except Exception as e:
         print(f"Error loading issue types: {e}")
         issue_types = []
 
-    return render_template('map/map.html', issue_types=issue_types)
+    return render_template(
+        'map/map.html',
+        issue_types=issue_types,
+        cluster_max_zoom=current_app.config['MAP_CLUSTER_MAX_ZOOM'],
+        # Part of the tile URLs, so the browser refetches tiles after data changes
+        data_version=get_data_version()
+    )
+
+
+def _parse_bbox(value):
+    """
+    Parse a 'west,south,east,north' bounding box.
+
+    Returns:
+        tuple or None: (min_lat, min_lng, max_lat, max_lng)
+    """
+    parts = [float(p) for p in value.split(',')]
+    if len(parts) != 4:
+        raise ValueError('bbox must be west,south,east,north')
+    west, south, east, north = parts
+    return south, west, north, east
 
 
 @map_bp.route('/api/markers')
 @login_required
+@cached_response()
 def get_markers():
-    """API endpoint to fetch issue markers for the map"""
+    """
+    API endpoint to fetch issue markers for the map.
+
+    With bbox=west,south,east,north and zoom, only issues inside the
+    viewport are returned: as grid clusters below MAP_CLUSTER_MAX_ZOOM,
+    as individual markers above it. Without bbox, every marker is returned
+    as a plain list.
+
+    With view=incidents, merged incidents are returned instead of individual
+    reports, each marker carrying its report count.
+    """
     try:
-        db = get_db()
+        repository = get_repository()
+
+        bbox_param = request.args.get('bbox')
+        view = request.args.get('view', 'issues')
+        try:
+            filters = parse_issue_filters(request.args)
+            bbox = _parse_bbox(bbox_param) if bbox_param else None
+            zoom = request.args.get('zoom', type=int)
+            if view not in ('issues', 'incidents'):
+                raise ValueError('view must be issues or incidents')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if bbox and zoom is not None and zoom < current_app.config['MAP_CLUSTER_MAX_ZOOM']:
+            # A 256px tile spans 360 / 2^zoom degrees; cluster in quarter-tile cells
+            cell_size = 360.0 / (2 ** max(zoom, 0)) / 4
 
-        # Start building query - only get issues with valid coordinates
-        query = db.table('issues').select('id, latitude, longitude, timestamp, image_url, issue_types(name)')
+            if view == 'incidents':
+                clusters = [{
+                    'lat': row['lat'],
+                    'lng': row['lng'],
+                    'count': row['incident_count']
+                } for row in repository.incident_clusters(bbox, cell_size, filters)]
 
-        # Filter out issues with extraction errors
-        query = query.eq('extraction_error', False)
+                return jsonify({'mode': 'clusters', 'clusters': clusters, 'markers': []})
 
-        # Apply filters from query parameters
-        issue_type_id = request.args.get('issue_type')
-        if issue_type_id:
-            query = query.eq('issue_type_id', int(issue_type_id))
+            rows = repository.marker_clusters(bbox, cell_size, filters)
 
-        date_from = request.args.get('date_from')
-        if date_from:
-            query = query.gte('timestamp', date_from)
+            clusters = [{
+                'lat': row['lat'],
+                'lng': row['lng'],
+                'count': row['issue_count']
+            } for row in rows]
 
-        date_to = request.args.get('date_to')
-        if date_to:
-            query = query.lte('timestamp', date_to)
+            return jsonify({'mode': 'clusters', 'clusters': clusters, 'markers': []})
 
-        # Execute query
-        result = query.execute()
-        issues = result.data
+        if view == 'incidents':
+            limit = current_app.config['MAP_MAX_MARKERS'] if bbox else None
+            markers = _incident_markers(repository.incidents(filters, bbox=bbox, limit=limit))
+            if bbox:
+                return jsonify({'mode': 'markers', 'clusters': [], 'markers': markers})
+            return jsonify(markers)
+
+        # Only issues with valid coordinates; inside the viewport, newest first and capped
+        if bbox:
+            issues = repository.markers(filters, bbox=bbox, limit=current_app.config['MAP_MAX_MARKERS'])
+        else:
+            issues = repository.markers(filters)
 
         # Format markers for frontend
+        type_names = get_issue_type_names()
         markers = []
         for issue in issues:
             # Skip issues without coordinates
@@ -61,11 +118,15 @@ def get_markers():
                 'id': issue['id'],
                 'lat': float(issue['latitude']),
                 'lng': float(issue['longitude']),
-                'type': issue['issue_types']['name'] if issue.get('issue_types') else 'Unknown',
+                'type': type_names.get(issue['issue_type_id'], 'Unknown'),
                 'timestamp': issue['timestamp'],
-                'image_url': issue['image_url']
+                'image_url': issue['image_url'],
+                'thumbnail_url': issue['thumbnail_url'] or issue['image_url']
             })
 
+        if bbox:
+            return jsonify({'mode': 'markers', 'clusters': [], 'markers': markers})
+
         return jsonify(markers)
 
     except Exception as e:
@@ -73,3 +134,60 @@ def get_markers():
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+
+
+def _incident_markers(incidents):
+    """Format incident rows as map markers."""
+    type_names = get_issue_type_names()
+    return [{
+        'id': incident['id'],
+        'lat': float(incident['latitude']),
+        'lng': float(incident['longitude']),
+        'type': type_names.get(incident['issue_type_id'], 'Unknown'),
+        'first_seen': incident['first_seen'],
+        'last_seen': incident['last_seen'],
+        'count': incident['report_count'],
+        'image_url': incident['image_url'],
+        'thumbnail_url': incident['thumbnail_url'] or incident['image_url']
+    } for incident in incidents]
+
+
+# Deepest zoom level served as vector tiles
+MAX_TILE_ZOOM = 22
+
+
+@map_bp.route('/tiles/<int:z>/<int:x>/<int:y>.pbf')
+@login_required
+def get_tile(z, x, y):
+    """
+    Mapbox Vector Tile of issues for the map.
+
+    Honours the same issue_type/date_from/date_to filters as the markers
+    API. Tiles are cached server-side per filter set and data version, and
+    the browser may reuse them for MAP_TILE_MAX_AGE seconds.
+    """
+    if not (0 <= z <= MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        return jsonify({'error': 'Invalid tile coordinates'}), 400
+
+    response = current_app.make_response(_render_tile(z, x, y))
+    if response.status_code == 200:
+        response.headers['Cache-Control'] = f"private, max-age={current_app.config['MAP_TILE_MAX_AGE']}"
+    return response
+
+
+@cached_response(store='tile')
+def _render_tile(z, x, y):
+    try:
+        filters = parse_issue_filters(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        tile = get_repository().tile(z, x, y, filters)
+        return Response(tile, mimetype='application/vnd.mapbox-vector-tile')
+
+    except Exception as e:
+        print(f"Error rendering tile {z}/{x}/{y}: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
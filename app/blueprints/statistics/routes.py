@@ -1,7 +1,10 @@
-from flask import render_template, jsonify
+from flask import render_template, jsonify, request
 from app.blueprints.statistics import statistics_bp
 from app.utils.auth import login_required
 from app.utils.db import get_db
+from app.utils.repository import get_repository
+from app.utils.response_cache import cached_response
+from app.utils.issue_types import get_issue_type_names
 from datetime import datetime, timedelta
 
 
@@ -12,35 +15,26 @@ def index():
     return render_template('statistics/statistics.html')
 
 
+def _counts_incidents():
+    """Whether the charts should count merged incidents (view=incidents) instead of reports."""
+    return request.args.get('view') == 'incidents'
+
+
 @statistics_bp.route('/api/summary')
 @login_required
+@cached_response()
 def get_summary():
     """Get summary statistics"""
     try:
-        db = get_db()
-
-        # Total issues
-        total_result = db.table('issues').select('id', count='exact').execute()
-        total_issues = total_result.count
-
-        # Issues with successful extraction
-        successful_result = db.table('issues').select('id', count='exact').eq('extraction_error', False).execute()
-        successful_extractions = successful_result.count
-
-        # Issues with failed extraction
-        failed_result = db.table('issues').select('id', count='exact').eq('extraction_error', True).execute()
-        failed_extractions = failed_result.count
-
-        # Issues from last 7 days
+        # All figures in one round trip
         week_ago = (datetime.now() - timedelta(days=7)).isoformat()
-        recent_result = db.table('issues').select('id', count='exact').gte('created_at', week_ago).execute()
-        recent_issues = recent_result.count
+        row = get_repository().summary_stats(week_ago)
 
         summary = {
-            'total_issues': total_issues or 0,
-            'successful_extractions': successful_extractions or 0,
-            'failed_extractions': failed_extractions or 0,
-            'recent_issues': recent_issues or 0
+            'total_issues': row.get('total_issues') or 0,
+            'successful_extractions': row.get('successful_extractions') or 0,
+            'failed_extractions': row.get('failed_extractions') or 0,
+            'recent_issues': row.get('recent_issues') or 0
         }
 
         return jsonify(summary)
@@ -54,20 +48,20 @@ def get_summary():
 
 @statistics_bp.route('/api/by-type')
 @login_required
+@cached_response()
 def get_by_type():
-    """Get issues count by type"""
+    """Get issues (or incidents, with view=incidents) count by type"""
     try:
-        db = get_db()
+        # Counted in the database, one row per type
+        repository = get_repository()
+        rows = repository.incident_counts_by_type() if _counts_incidents() else repository.counts_by_type()
 
-        # Get all issues with their types
-        result = db.table('issues').select('issue_type_id, issue_types(name)').execute()
-        issues = result.data
-
-        # Count by type
+        # Count by type, names resolved from the cached issue types
+        type_names = get_issue_type_names()
         type_counts = {}
-        for issue in issues:
-            type_name = issue['issue_types']['name'] if issue.get('issue_types') else 'Unknown'
-            type_counts[type_name] = type_counts.get(type_name, 0) + 1
+        for row in rows:
+            type_name = type_names.get(row['issue_type_id'], 'Unknown')
+            type_counts[type_name] = type_counts.get(type_name, 0) + row['issue_count']
 
         data = {
             'labels': list(type_counts.keys()),
@@ -85,35 +79,32 @@ def get_by_type():
 
 @statistics_bp.route('/api/timeline')
 @login_required
+@cached_response()
 def get_timeline():
-    """Get issues by type over time based on issue timestamp"""
+    """Get issues (or incidents, with view=incidents) by type over time based on issue timestamp"""
     try:
-        db = get_db()
-
-        # Get all issues with their types and timestamps (use timestamp field, not created_at)
-        result = db.table('issues').select('timestamp, issue_type_id, issue_types(name)').order('timestamp').execute()
-        issues = result.data
-
-        # Filter out issues without timestamps
-        issues = [i for i in issues if i.get('timestamp')]
+        # Counted in the database, one row per (month, type); issues without timestamps are excluded
+        repository = get_repository()
+        rows = repository.incident_counts_by_month() if _counts_incidents() else repository.counts_by_month()
 
-        if not issues:
+        if not rows:
             return jsonify({'labels': [], 'datasets': []})
 
         # Group by month
+        type_names = get_issue_type_names()
         monthly_data = {}
         issue_types = set()
 
-        for issue in issues:
-            # Extract month from timestamp (YYYY-MM)
-            month = issue['timestamp'][:7]
-            type_name = issue['issue_types']['name'] if issue.get('issue_types') else 'Unknown'
+        for row in rows:
+            # Month comes back as YYYY-MM-DD
+            month = row['month'][:7]
+            type_name = type_names.get(row['issue_type_id'], 'Unknown')
             issue_types.add(type_name)
 
             if month not in monthly_data:
                 monthly_data[month] = {}
 
-            monthly_data[month][type_name] = monthly_data[month].get(type_name, 0) + 1
+            monthly_data[month][type_name] = monthly_data[month].get(type_name, 0) + row['issue_count']
 
         # Sort months chronologically
         sorted_months = sorted(monthly_data.keys())
@@ -147,3 +138,11 @@ def get_timeline():
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
+
+
+@statistics_bp.cli.command('rebuild-rollup')
+def rebuild_rollup():
+    """Recompute the issue_stats_daily rollup from the issues table."""
+    db = get_db()
+    result = db.rpc('rebuild_issue_stats_daily').execute()
+    print(f"✓ Rebuilt statistics rollup: {result.data} group(s)")
@@ -1,22 +1,27 @@
-import os
-import tempfile
+import io
+from datetime import datetime
 from flask import render_template, request, redirect, url_for, flash, jsonify, current_app
 from app.blueprints.upload import upload_bp
 from app.utils.auth import login_required
+from app.utils.issue_types import get_issue_types
+from app.utils.upload_pipeline import process_uploaded_files
+from app.utils.job_queue import enqueue_upload_job, get_job
+from app.utils.metadata_extractor import get_extraction_stats
 from app.utils.db import get_db
-from app.utils.gemini_extractor import extract_watermark_data
-from app.utils.storage import upload_image_to_storage
+from app.utils.storage import download_image_from_storage
+from app.utils.image_derivatives import store_derivatives, derivative_columns
+from app.utils.perceptual_hash import dhash, hash_columns
+from app.utils.incidents import IncidentMatcher
+from app.utils.response_cache import bump_data_version
 
 
 @upload_bp.route('/')
 @login_required
 def index():
     """Upload page with multi-file input and issue type selection"""
-    # Fetch issue types from database
+    # Active issue types (cached)
     try:
-        db = get_db()
-        result = db.table('issue_types').select('id, name').eq('active', True).order('name').execute()
-        issue_types = result.data
+        issue_types = get_issue_types(active_only=True)
     except Exception as e:
         flash(f'Error loading issue types: {str(e)}', 'error')
         issue_types = []
@@ -37,105 +42,50 @@ def process_upload():
     if len(files) != len(issue_types):
         return jsonify({'error': 'Mismatch between files and issue types'}), 400
 
-    db = get_db()
-    success_count = 0
-    failed_count = 0
-    failed_details = []
-
-    for idx, file in enumerate(files):
-        issue_type_id = issue_types[idx]
-        temp_path = None
-        filename = file.filename
-
+    if current_app.config['UPLOAD_QUEUE_ENABLED']:
+        # Persist the files and let a background worker process them
         try:
-            print(f"\n{'='*60}")
-            print(f"Processing file {idx + 1}/{len(files)}: {filename}")
-            print(f"Issue type ID: {issue_type_id}")
-
-            # Save file to temp location for processing
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as temp_file:
-                file.save(temp_file.name)
-                temp_path = temp_file.name
-            print(f"✓ File saved to temp: {temp_path}")
-
-            # Extract GPS and timestamp using Gemini (primary method)
-            print("Starting Gemini extraction...")
-            extracted_data = extract_watermark_data(temp_path)
-
-            latitude = extracted_data.get('latitude')
-            longitude = extracted_data.get('longitude')
-            timestamp = extracted_data.get('timestamp')
-            raw_text = extracted_data.get('raw_text')
-
-            print(f"✓ Gemini extraction complete:")
-            print(f"  - Latitude: {latitude}")
-            print(f"  - Longitude: {longitude}")
-            print(f"  - Timestamp: {timestamp}")
-            print(f"  - Raw text: {raw_text[:100] if raw_text else None}...")
-
-            # Upload image to Supabase Storage
-            file.seek(0)  # Reset file pointer
-            print("Uploading to Supabase Storage...")
-            storage_result = upload_image_to_storage(file)
-
-            if not storage_result['success']:
-                raise Exception(f"Storage upload failed: {storage_result['error']}")
-
-            print(f"✓ Image uploaded to storage:")
-            print(f"  - URL: {storage_result['url']}")
-            print(f"  - Path: {storage_result['path']}")
-
-            # Check if extraction was successful
-            has_error = latitude is None or longitude is None
-
-            # Save to database
-            issue_data = {
-                'issue_type_id': int(issue_type_id),
-                'latitude': latitude,
-                'longitude': longitude,
-                'timestamp': timestamp.isoformat() if timestamp else None,
-                'image_url': storage_result['url'],
-                'image_path': storage_result['path'],
-                'extraction_error': has_error,
-                'error_message': 'Failed to extract GPS coordinates' if has_error else None,
-                'raw_extraction_text': raw_text
-            }
-
-            print(f"Saving to database...")
-            print(f"  - Issue data: {issue_data}")
-            result = db.table('issues').insert(issue_data).execute()
-            print(f"✓ Saved to database. Result: {result}")
-
-            success_count += 1
-            print(f"✓ File {filename} processed successfully!")
-
+            job_id = enqueue_upload_job(files, issue_types)
         except Exception as e:
-            failed_count += 1
-            error_msg = str(e)
-            print(f"✗ Error processing {filename}: {error_msg}")
+            print(f"Error queueing upload job: {e}")
             import traceback
             traceback.print_exc()
-            failed_details.append({
-                'filename': filename,
-                'error': error_msg
-            })
-
-        finally:
-            # Clean up temp file
-            if temp_path and os.path.exists(temp_path):
-                os.remove(temp_path)
-                print(f"✓ Cleaned up temp file")
-
-    results = {
-        'success': success_count,
-        'failed': failed_count,
-        'total': len(files),
-        'failed_details': failed_details
-    }
+            return jsonify({'error': f'Failed to queue upload: {str(e)}'}), 500
+
+        return jsonify({
+            'job_id': job_id,
+            'status_url': url_for('upload.job_status', job_id=job_id),
+            'total': len(files)
+        }), 202
+
+    results = process_uploaded_files(files, issue_types)
 
     return jsonify(results)
 
 
+@upload_bp.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    """Report the progress of a background upload job"""
+    try:
+        job = get_job(job_id)
+    except Exception as e:
+        print(f"Error fetching upload job {job_id}: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    return jsonify(job)
+
+
+@upload_bp.route('/api/extraction-stats')
+@login_required
+def extraction_stats():
+    """Per-tier extraction counters for this worker process"""
+    return jsonify(get_extraction_stats())
+
+
 @upload_bp.route('/errors')
 @login_required
 def errors():
@@ -149,3 +99,111 @@ def errors():
         failed_uploads = []
 
     return render_template('upload_errors.html', failed_uploads=failed_uploads)
+
+
+@upload_bp.cli.command('backfill-phash')
+def backfill_phash():
+    """Compute perceptual hashes for stored issues that do not have one yet."""
+    db = get_db()
+    page_size = current_app.config.get('EXPORT_PAGE_SIZE', 1000)
+    hashed = failed = 0
+    last_id = 0
+
+    while True:
+        rows = db.table('issues').select('id, image_path').is_('phash', 'null').not_.is_(
+            'image_path', 'null'
+        ).gt('id', last_id).order('id').limit(page_size).execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            download = download_image_from_storage(row['image_path'])
+            try:
+                if not download['success']:
+                    raise Exception(download['error'])
+                columns = hash_columns(dhash(io.BytesIO(download['data'])))
+                db.table('issues').update(columns).eq('id', row['id']).execute()
+                hashed += 1
+            except Exception as e:
+                print(f"✗ Issue #{row['id']}: {e}")
+                failed += 1
+
+        last_id = rows[-1]['id']
+
+    print(f"✓ Hashed {hashed} issue(s), {failed} failed")
+
+
+@upload_bp.cli.command('merge-incidents')
+def merge_incidents():
+    """Assign located issues that are not part of an incident yet, in upload order."""
+    db = get_db()
+    config = current_app.config
+    matcher = IncidentMatcher(config['INCIDENT_MAX_DISTANCE'], config['INCIDENT_TIME_WINDOW_DAYS'])
+    page_size = config.get('EXPORT_PAGE_SIZE', 1000)
+    merged = created = 0
+    last_id = 0
+
+    while True:
+        rows = db.table('issues').select(
+            'id, issue_type_id, latitude, longitude, timestamp, image_url, thumbnail_url'
+        ).is_('incident_id', 'null').eq('extraction_error', False).not_.is_(
+            'timestamp', 'null'
+        ).gt('id', last_id).order('id').limit(page_size).execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            incident_id, is_new = matcher.assign(
+                row['issue_type_id'], float(row['latitude']), float(row['longitude']),
+                datetime.fromisoformat(row['timestamp']), row['image_url'], row['thumbnail_url']
+            )
+            # Counts and time span are updated by the issues trigger
+            db.table('issues').update({'incident_id': incident_id}).eq('id', row['id']).execute()
+            merged += 1
+            created += is_new
+
+        last_id = rows[-1]['id']
+
+    if merged:
+        bump_data_version()
+    print(f"✓ Assigned {merged} issue(s) to incidents, {created} new incident(s)")
+
+
+@upload_bp.cli.command('generate-derivatives')
+def generate_derivatives():
+    """Create the resized copies of stored issue photos that do not have them yet."""
+    db = get_db()
+    page_size = current_app.config.get('EXPORT_PAGE_SIZE', 1000)
+    generated = failed = 0
+    last_id = 0
+
+    while True:
+        rows = db.table('issues').select('id, image_path, image_url, incident_id').is_('thumbnail_path', 'null').not_.is_(
+            'image_path', 'null'
+        ).gt('id', last_id).order('id').limit(page_size).execute().data
+        if not rows:
+            break
+
+        for row in rows:
+            download = download_image_from_storage(row['image_path'])
+            try:
+                if not download['success']:
+                    raise Exception(download['error'])
+                stored = store_derivatives(io.BytesIO(download['data']), row['image_path'], current_app.config)
+                columns = derivative_columns(stored)
+                db.table('issues').update(columns).eq('id', row['id']).execute()
+                if row['incident_id']:
+                    # Incidents show the photo of their first report
+                    db.table('incidents').update({'thumbnail_url': columns['thumbnail_url']}).eq(
+                        'id', row['incident_id']
+                    ).eq('image_url', row['image_url']).execute()
+                generated += 1
+            except Exception as e:
+                print(f"✗ Issue #{row['id']}: {e}")
+                failed += 1
+
+        last_id = rows[-1]['id']
+
+    if generated:
+        bump_data_version()
+    print(f"✓ Created resized copies for {generated} issue(s), {failed} failed")
@@ -1,20 +1,83 @@
-from supabase import create_client, Client
-from flask import current_app, g
+import os
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
+from flask import current_app
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _reset_client():
+    """Drop the shared client so a forked worker opens its own connections."""
+    global _client, _client_lock
+    _client = None
+    _client_lock = threading.Lock()
+
+
+# Sockets in the connection pool must not be shared between processes
+os.register_at_fork(after_in_child=_reset_client)
+
+
+def _pooled_session(session, limits):
+    """Replace an httpx session with one using the configured connection limits."""
+    pooled = httpx.Client(
+        base_url=session.base_url,
+        headers=session.headers,
+        timeout=session.timeout,
+        limits=limits,
+        follow_redirects=True,
+        http2=True
+    )
+    session.close()
+    return pooled
+
+
+def _create_client(config):
+    options = ClientOptions(
+        postgrest_client_timeout=config['SUPABASE_POSTGREST_TIMEOUT'],
+        storage_client_timeout=config['SUPABASE_STORAGE_TIMEOUT']
+    )
+    client = create_client(config['SUPABASE_URL'], config['SUPABASE_SERVICE_KEY'], options)
+
+    limits = httpx.Limits(
+        max_connections=config['SUPABASE_POOL_SIZE'],
+        max_keepalive_connections=config['SUPABASE_POOL_SIZE'],
+        keepalive_expiry=config['SUPABASE_POOL_KEEPALIVE']
+    )
+
+    # Create the sub-clients now, while holding the lock, and give them pooled
+    # sessions; supabase-py builds them lazily and without any connection limits
+    client.postgrest.session = _pooled_session(client.postgrest.session, limits)
+    storage = client.storage
+    storage.session = storage._client = _pooled_session(storage.session, limits)
+
+    return client
 
 
 def get_db():
-    """Get Supabase client from flask g object, create if not exists"""
-    if 'db' not in g:
-        g.db = create_client(
-            current_app.config['SUPABASE_URL'],
-            current_app.config['SUPABASE_SERVICE_KEY']
-        )
-    return g.db
+    """
+    Get the process-wide Supabase client.
+
+    The client is created on first use and then shared by every request and
+    thread in the worker, so HTTP keep-alive connections are reused instead
+    of being set up again for each request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = _create_client(current_app.config)
+    return _client
 
 
 def close_db(e=None):
-    """Close database connection"""
-    g.pop('db', None)
+    """
+    End of request hook.
+
+    The shared client outlives requests and is deliberately kept open.
+    """
 
 
 def init_app(app):
@@ -3,10 +3,13 @@ import piexif
 from datetime import datetime
 
 
-def extract_exif_data(image_path):
+def extract_exif_data(image_source):
     """
     Extract GPS coordinates and timestamp from image EXIF data.
 
+    Args:
+        image_source: Path to the image file or a binary file object
+
     Returns:
         dict: {
             'latitude': float or None,
@@ -23,7 +26,7 @@ def extract_exif_data(image_path):
     }
 
     try:
-        image = Image.open(image_path)
+        image = Image.open(image_source)
 
         # Check if image has EXIF data
         if 'exif' not in image.info:
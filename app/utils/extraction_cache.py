@@ -0,0 +1,170 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from flask import current_app
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS extraction_cache (
+    key TEXT PRIMARY KEY,
+    latitude REAL,
+    longitude REAL,
+    timestamp TEXT,
+    raw_text TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_extraction_cache_last_used ON extraction_cache(last_used);
+"""
+
+
+class ExtractionCache:
+    """
+    Persistent, size-bounded LRU cache of watermark extraction results.
+
+    Entries are keyed by a SHA-256 of the image bytes together with the
+    prompt and model name, so a prompt or model change never returns stale
+    results. Backed by SQLite so it survives restarts and is shared by all
+    processes on the host.
+    """
+
+    def __init__(self, path, max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(image_bytes, prompt, model_name):
+        """Build the cache key for an image/prompt/model combination (image as bytes or any buffer)."""
+        digest = hashlib.sha256()
+        digest.update(model_name.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(prompt.encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(image_bytes)
+        return digest.hexdigest()
+
+    def _connect(self):
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            self._initialized = True
+        return conn
+
+    def get(self, key):
+        """
+        Look up a cached extraction result.
+
+        Returns:
+            dict or None: {'latitude', 'longitude', 'timestamp', 'raw_text'} on a hit
+        """
+        if not self.enabled:
+            return None
+
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute('SELECT * FROM extraction_cache WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    conn.execute('UPDATE extraction_cache SET last_used = ? WHERE key = ?', (time.time(), key))
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"  → WARNING: extraction cache lookup failed: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return {
+            'latitude': row['latitude'],
+            'longitude': row['longitude'],
+            'timestamp': datetime.fromisoformat(row['timestamp']) if row['timestamp'] else None,
+            'raw_text': row['raw_text']
+        }
+
+    def put(self, key, result):
+        """Store an extraction result, evicting the least recently used entries if full."""
+        if not self.enabled:
+            return
+
+        now = time.time()
+        timestamp = result.get('timestamp')
+
+        try:
+            conn = self._connect()
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.execute(
+                    'INSERT OR REPLACE INTO extraction_cache '
+                    '(key, latitude, longitude, timestamp, raw_text, created_at, last_used) '
+                    'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key, result.get('latitude'), result.get('longitude'),
+                     timestamp.isoformat() if timestamp else None,
+                     result.get('raw_text'), now, now)
+                )
+                count = conn.execute('SELECT COUNT(*) FROM extraction_cache').fetchone()[0]
+                if count > self.max_entries:
+                    conn.execute(
+                        'DELETE FROM extraction_cache WHERE key IN '
+                        '(SELECT key FROM extraction_cache ORDER BY last_used LIMIT ?)',
+                        (count - self.max_entries,)
+                    )
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"  → WARNING: extraction cache store failed: {e}")
+
+    def stats(self):
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / lookups if lookups else 0.0
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """Get the process-wide extraction cache configured from the app config."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = ExtractionCache(
+                    current_app.config['EXTRACTION_CACHE_PATH'],
+                    current_app.config['EXTRACTION_CACHE_MAX_ENTRIES']
+                )
+    return _cache
@@ -1,8 +1,48 @@
 import os
 import re
+import threading
 from datetime import datetime
+from flask import current_app
 import vertexai
 from vertexai.generative_models import GenerativeModel, Part
+from app.utils.extraction_cache import get_extraction_cache
+from app.utils.image_buffer import ImageBuffer
+from app.utils.image_preprocess import crop_watermark_band
+
+
+MODEL_NAME = 'gemini-2.0-flash-001'
+
+WATERMARK_PROMPT = """
+You are analyzing a photo taken by a citizen reporting an issue to city hall. The photo has a watermark overlay at the bottom with GPS location information and timestamp.
+
+IMPORTANT: Look carefully at the bottom of the image for text overlays showing location data.
+
+Extract the following information from ANY visible text watermarks:
+
+1. GPS COORDINATES - Look for patterns like:
+   - "Lat 44.513561° Long 26.021965°"
+   - "44.513561, 26.021965"
+   - "N 44°30'48.8" E 26°01'19.1""
+   - Any numbers that look like latitude and longitude (latitude is typically -90 to 90, longitude -180 to 180)
+
+2. TIMESTAMP - Look for dates and times like:
+   - "19/11/24 09:50 AM"
+   - "2024-11-19 09:50:00"
+   - "19.11.2024 09:50"
+   - Any date/time pattern
+
+3. LOCATION NAME/ADDRESS - Extract any street names, city names, or addresses you see
+
+Return ONLY the extracted values in this EXACT format:
+LATITUDE: <decimal number>
+LONGITUDE: <decimal number>
+TIMESTAMP: <convert to YYYY-MM-DD HH:MM:SS format, for example 2024-11-19 09:50:00>
+LOCATION: <address or location name if visible>
+
+For fields you cannot find, write "NOT FOUND"
+
+CRITICAL: Focus on the watermark text at the bottom of the image. Read it character by character. The coordinates are there!
+"""
 
 
 def initialize_gemini():
@@ -16,12 +56,47 @@ def initialize_gemini():
     vertexai.init(project=project_id, location=location)
 
 
-def extract_watermark_data(image_path):
+_model = None
+_model_lock = threading.Lock()
+
+
+def _reset_model():
+    """Drop the shared model so a forked worker builds its own client."""
+    global _model, _model_lock
+    _model = None
+    _model_lock = threading.Lock()
+
+
+# gRPC channels do not survive fork(); every worker process creates its own
+os.register_at_fork(after_in_child=_reset_model)
+
+
+def get_model():
+    """
+    Get the process-wide Gemini model, initializing Vertex AI on first use.
+
+    The model is created once per worker process and shared by all threads.
+    """
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                initialize_gemini()
+                _model = GenerativeModel(MODEL_NAME)
+    return _model
+
+
+def warm_up():
+    """Create the shared model ahead of the first extraction request."""
+    get_model()
+
+
+def extract_watermark_data(image):
     """
     Extract GPS coordinates and timestamp from image watermarks using Gemini Vision.
 
     Args:
-        image_path: Path to the image file
+        image: ImageBuffer, path to the image file, or the image bytes
 
     Returns:
         dict: {
@@ -39,70 +114,42 @@ def extract_watermark_data(image_path):
     }
 
     try:
-        print("  → Initializing Gemini...")
-        # Initialize Gemini
-        initialize_gemini()
-        print("  → Gemini initialized successfully")
-
         # Load the image
-        print(f"  → Loading image from {image_path}...")
-        with open(image_path, 'rb') as f:
-            image_bytes = f.read()
-        print(f"  → Image loaded, size: {len(image_bytes)} bytes")
-
-        # Create the model
-        print("  → Creating GenerativeModel...")
-        model = GenerativeModel('gemini-2.0-flash-001')
-        print("  → Model created")
-
-        # Create the prompt
-        prompt = """
-        You are analyzing a photo taken by a citizen reporting an issue to city hall. The photo has a watermark overlay at the bottom with GPS location information and timestamp.
-
-        IMPORTANT: Look carefully at the bottom of the image for text overlays showing location data.
-
-        Extract the following information from ANY visible text watermarks:
-
-        1. GPS COORDINATES - Look for patterns like:
-           - "Lat 44.513561° Long 26.021965°"
-           - "44.513561, 26.021965"
-           - "N 44°30'48.8" E 26°01'19.1""
-           - Any numbers that look like latitude and longitude (latitude is typically -90 to 90, longitude -180 to 180)
-
-        2. TIMESTAMP - Look for dates and times like:
-           - "19/11/24 09:50 AM"
-           - "2024-11-19 09:50:00"
-           - "19.11.2024 09:50"
-           - Any date/time pattern
-
-        3. LOCATION NAME/ADDRESS - Extract any street names, city names, or addresses you see
-
-        Return ONLY the extracted values in this EXACT format:
-        LATITUDE: <decimal number>
-        LONGITUDE: <decimal number>
-        TIMESTAMP: <convert to YYYY-MM-DD HH:MM:SS format, for example 2024-11-19 09:50:00>
-        LOCATION: <address or location name if visible>
-
-        For fields you cannot find, write "NOT FOUND"
-
-        CRITICAL: Focus on the watermark text at the bottom of the image. Read it character by character. The coordinates are there!
-        """
-
-        # Generate response
-        print("  → Calling Gemini API...")
-        response = model.generate_content([
-            Part.from_data(image_bytes, mime_type='image/jpeg'),
-            prompt
-        ])
-        print("  → Gemini API call completed")
-
-        if response and hasattr(response, 'text') and response.text:
-            print(f"  → Gemini returned text: {response.text[:200]}...")
-            result['raw_text'] = response.text
-            result = _parse_gemini_response(response.text)
-        else:
-            print("  → WARNING: Gemini returned empty response")
-            print(f"  → Response object: {response}")
+        if isinstance(image, (str, os.PathLike)):
+            print(f"  → Loading image from {image}...")
+            with open(image, 'rb') as f:
+                image = ImageBuffer(f.read())
+        elif not isinstance(image, ImageBuffer):
+            image = ImageBuffer(image)
+        print(f"  → Image size: {len(image)} bytes")
+
+        # Re-uploads of the same photo are answered from the cache;
+        # hashed through a view so spilled images are not copied
+        cache = get_extraction_cache()
+        with image.view as view:
+            cache_key = cache.make_key(view, WATERMARK_PROMPT, MODEL_NAME)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            print("  → Extraction cache hit")
+            return cached
+
+        # Shared model, initialized on first use
+        model = get_model()
+
+        # Send only the watermark band first; it is a fraction of the payload
+        band_bytes = _prepare_watermark_band(image)
+        if band_bytes is not None:
+            print(f"  → Sending watermark band, size: {len(band_bytes)} bytes")
+            result = _generate(model, band_bytes, result)
+
+        # Fall back to the full frame if the band didn't yield coordinates
+        if result['latitude'] is None or result['longitude'] is None:
+            print("  → Sending full image")
+            result = _generate(model, image.getvalue(), result)
+
+        # Only cache usable results so failed extractions can be retried
+        if result['latitude'] is not None and result['longitude'] is not None:
+            cache.put(cache_key, result)
 
         return result
 
@@ -114,6 +161,61 @@ def extract_watermark_data(image_path):
         return result
 
 
+def _prepare_watermark_band(image):
+    """
+    Crop and downscale the watermark band according to the GEMINI_CROP_* settings.
+
+    The band is decoded from a stream over the buffer, so the original is
+    never copied into a bytes object.
+
+    Returns:
+        bytes or None: JPEG band, or None if cropping is disabled or fails
+    """
+    config = current_app.config
+    if not config['GEMINI_CROP_ENABLED']:
+        return None
+
+    try:
+        with image.stream() as stream:
+            return crop_watermark_band(
+                stream,
+                band_fraction=config['GEMINI_CROP_FRACTION'],
+                max_dimension=config['GEMINI_MAX_DIMENSION'],
+                quality=config['GEMINI_JPEG_QUALITY']
+            )
+    except Exception as e:
+        print(f"  → WARNING: could not crop watermark band: {e}")
+        return None
+
+
+def _generate(model, image_bytes, previous):
+    """
+    Run the watermark prompt against one image payload.
+
+    Args:
+        model: Gemini model
+        image_bytes: JPEG payload to send
+        previous: Result to return if the model gives an empty response
+
+    Returns:
+        dict: Parsed result
+    """
+    print("  → Calling Gemini API...")
+    response = model.generate_content([
+        Part.from_data(image_bytes, mime_type='image/jpeg'),
+        WATERMARK_PROMPT
+    ])
+    print("  → Gemini API call completed")
+
+    if response and hasattr(response, 'text') and response.text:
+        print(f"  → Gemini returned text: {response.text[:200]}...")
+        return _parse_gemini_response(response.text)
+
+    print("  → WARNING: Gemini returned empty response")
+    print(f"  → Response object: {response}")
+    return previous
+
+
 def _parse_gemini_response(text):
     """
     Parse Gemini's response to extract GPS coordinates and timestamp.
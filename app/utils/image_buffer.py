@@ -0,0 +1,119 @@
+import io
+import mmap
+import os
+import shutil
+import tempfile
+
+
+class ImageBuffer:
+    """
+    Image bytes read once and shared by every pipeline stage.
+
+    Small images are held as a single bytes object. Images above the spill
+    threshold live in a file on disk and are memory-mapped, so they are not
+    copied onto the heap. Use as a context manager or call close().
+    """
+
+    def __init__(self, data, path=None, owns_path=False, file=None):
+        self._data = data
+        self._file = file
+        self.path = path
+        self.owns_path = owns_path
+
+    @classmethod
+    def from_stream(cls, stream, spill_threshold, suffix='.jpg'):
+        """
+        Read an upload stream once.
+
+        Args:
+            stream: Readable binary stream (e.g. FileStorage.stream)
+            spill_threshold: Size in bytes above which the data is spilled to a temp file
+            suffix: Extension for the temp file if the data is spilled
+
+        Returns:
+            ImageBuffer
+        """
+        head = stream.read(spill_threshold + 1)
+        if len(head) <= spill_threshold:
+            return cls(head)
+
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(head)
+                del head
+                shutil.copyfileobj(stream, f)
+            return cls._mapped(path, owns_path=True)
+        except Exception:
+            os.remove(path)
+            raise
+
+    @classmethod
+    def from_path(cls, path, spill_threshold):
+        """
+        Load an image file already on disk.
+
+        Files up to the spill threshold are read into memory; larger ones are
+        memory-mapped in place.
+        """
+        if os.path.getsize(path) <= spill_threshold:
+            with open(path, 'rb') as f:
+                return cls(f.read(), path=path)
+        return cls._mapped(path, owns_path=False)
+
+    @classmethod
+    def _mapped(cls, path, owns_path):
+        f = open(path, 'rb')
+        try:
+            if os.fstat(f.fileno()).st_size == 0:
+                f.close()
+                return cls(b'', path=path, owns_path=owns_path)
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            f.close()
+            raise
+        return cls(data, path=path, owns_path=owns_path, file=f)
+
+    @property
+    def spilled(self):
+        """True if the data is memory-mapped from disk rather than held in memory."""
+        return self._file is not None
+
+    @property
+    def view(self):
+        """Zero-copy view of the data (usable by hashlib and other buffer consumers)."""
+        return memoryview(self._data)
+
+    def stream(self):
+        """Open a fresh file-like object over the data without copying it."""
+        if self.spilled:
+            return open(self.path, 'rb')
+        return io.BytesIO(self._data)
+
+    def getvalue(self):
+        """
+        Get the data as bytes.
+
+        Free for in-memory buffers; copies the mapping for spilled ones.
+        """
+        if self.spilled:
+            return self._data[:]
+        return self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def close(self):
+        if self._file is not None:
+            self._data.close()
+            self._file.close()
+            self._file = None
+        self._data = b''
+        if self.owns_path and self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,90 @@
+import io
+import os
+from PIL import Image, ImageOps
+from app.utils.storage import upload_image_to_storage
+
+
+# Sized copies stored next to each original: name -> config key of the maximum width/height.
+# Issues get a <name>_path and <name>_url column for each (migration 015).
+DERIVATIVES = {
+    'thumbnail': 'IMAGE_THUMBNAIL_SIZE',
+    'display': 'IMAGE_DISPLAY_SIZE'
+}
+
+
+def derivative_columns(stored=None):
+    """
+    Get the issue columns for stored derivatives (all None when there are none).
+
+    Args:
+        stored: {name: {'path': str, 'url': str}} as returned by store_derivatives
+
+    Returns:
+        dict: {'thumbnail_path', 'thumbnail_url', 'display_path', 'display_url'}
+    """
+    columns = {}
+    for name in DERIVATIVES:
+        derivative = (stored or {}).get(name) or {}
+        columns[f'{name}_path'] = derivative.get('path')
+        columns[f'{name}_url'] = derivative.get('url')
+    return columns
+
+
+def render_derivatives(stream, sizes, quality=80):
+    """
+    Render downscaled WebP copies of an image.
+
+    The image is decoded once (at reduced resolution for JPEGs) and rotated
+    according to its EXIF orientation; every size is then scaled down from
+    the next larger one.
+
+    Args:
+        stream: Readable binary stream of the image
+        sizes: {name: maximum width/height in pixels}
+        quality: WebP quality
+
+    Returns:
+        dict: {name: WebP bytes}
+    """
+    image = Image.open(stream)
+    largest = max(sizes.values())
+    # Let the JPEG decoder downscale while decoding
+    image.draft('RGB', (largest, largest))
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+
+    rendered = {}
+    for name, size in sorted(sizes.items(), key=lambda item: item[1], reverse=True):
+        # thumbnail() never upscales, so small originals keep their size
+        image.thumbnail((size, size), Image.LANCZOS)
+        output = io.BytesIO()
+        image.save(output, format='WEBP', quality=quality, method=4)
+        rendered[name] = output.getvalue()
+    return rendered
+
+
+def store_derivatives(stream, image_path, config):
+    """
+    Render the DERIVATIVES of an image and upload them next to the original.
+
+    Args:
+        stream: Readable binary stream of the original image
+        image_path: Storage path of the original
+        config: App config with the DERIVATIVES sizes and IMAGE_DERIVATIVE_QUALITY
+
+    Returns:
+        dict: {name: {'path': str, 'url': str}}
+    """
+    sizes = {name: config[key] for name, key in DERIVATIVES.items()}
+    rendered = render_derivatives(stream, sizes, config['IMAGE_DERIVATIVE_QUALITY'])
+
+    stem = os.path.splitext(image_path)[0]
+    stored = {}
+    for name, data in rendered.items():
+        # Overwrites copies left by an earlier, interrupted run of the backfill
+        result = upload_image_to_storage(data, filename=f'{stem}_{name}.webp', content_type='image/webp', upsert=True)
+        if not result['success']:
+            raise Exception(f"Upload of {name} failed: {result['error']}")
+        stored[name] = {'path': result['path'], 'url': result['url']}
+    return stored
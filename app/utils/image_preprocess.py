@@ -0,0 +1,35 @@
+import io
+from PIL import Image, ImageOps
+
+
+def crop_watermark_band(image, band_fraction=0.35, max_dimension=1280, quality=85):
+    """
+    Cut the bottom band of a photo, where GPS camera apps draw their watermark.
+
+    The image is rotated according to its EXIF orientation first so "bottom"
+    means the bottom as displayed, then the band is downscaled to fit within
+    max_dimension and re-encoded as JPEG.
+
+    Args:
+        image: Original image bytes, or a readable binary stream of them
+        band_fraction: Fraction of the image height to keep, from the bottom
+        max_dimension: Maximum width/height of the result in pixels
+        quality: JPEG quality of the result
+
+    Returns:
+        bytes: JPEG-encoded band
+    """
+    image = Image.open(image if hasattr(image, 'read') else io.BytesIO(image))
+    image = ImageOps.exif_transpose(image)
+
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    width, height = image.size
+    band_height = max(1, int(height * band_fraction))
+    band = image.crop((0, height - band_height, width, height))
+    band.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+    output = io.BytesIO()
+    band.save(output, format='JPEG', quality=quality, optimize=True)
+    return output.getvalue()
@@ -0,0 +1,90 @@
+import math
+from app.utils.db import get_db
+
+
+EARTH_RADIUS_M = 6371000
+METRES_PER_DEGREE = math.pi * EARTH_RADIUS_M / 180
+
+
+def _row_width(row, row_height):
+    """Width in degrees of longitude of the cells in a grid row."""
+    # Measured at the row's poleward edge, so cells are at least row_height wide everywhere
+    edge = max(abs(row * row_height), abs((row + 1) * row_height))
+    return row_height / max(math.cos(math.radians(min(edge, 89.0))), 0.01)
+
+
+def grid_cell(latitude, longitude, cell_size_m):
+    """
+    Get the grid cell key of a point.
+
+    Rows are cell_size_m high and cells get wider in degrees towards the
+    poles (a sinusoidal grid), so every cell is at least cell_size_m across.
+
+    Returns:
+        str: 'row:column'
+    """
+    row_height = cell_size_m / METRES_PER_DEGREE
+    row = math.floor(latitude / row_height)
+    return f'{row}:{math.floor(longitude / _row_width(row, row_height))}'
+
+
+def neighbour_cells(latitude, longitude, cell_size_m):
+    """
+    Get the keys of the 3x3 block of cells around a point.
+
+    Any point within cell_size_m of the given one lies in one of these cells.
+    """
+    row_height = cell_size_m / METRES_PER_DEGREE
+    row = math.floor(latitude / row_height)
+
+    cells = []
+    for r in (row - 1, row, row + 1):
+        column = math.floor(longitude / _row_width(r, row_height))
+        cells.extend(f'{r}:{c}' for c in (column - 1, column, column + 1))
+    return cells
+
+
+def drop_empty_incidents(incident_ids):
+    """Delete incidents that ended up without any saved report."""
+    if incident_ids:
+        get_db().table('incidents').delete().in_('id', list(incident_ids)).eq('report_count', 0).execute()
+
+
+class IncidentMatcher:
+    """
+    Assigns reports to incidents.
+
+    Each lookup and creation is one call to find_or_create_incident
+    (migration 018), which holds advisory locks on the report's grid cells,
+    so reports of the same issue join one incident even when uploaded in
+    parallel by different workers.
+    """
+
+    def __init__(self, max_distance_m, window_days):
+        self.max_distance_m = max_distance_m
+        self.window_days = window_days
+
+    def assign(self, issue_type_id, latitude, longitude, timestamp, image_url, thumbnail_url=None):
+        """
+        Find the closest incident of a report, or start one at its location.
+
+        Its report count and time span are filled in by database triggers as
+        reports are saved with its ID (migration 014).
+
+        Returns:
+            tuple: (incident ID, True if the incident was created for this report)
+        """
+        result = get_db().rpc('find_or_create_incident', {
+            'report_issue_type_id': issue_type_id,
+            'report_lat': latitude,
+            'report_lng': longitude,
+            'report_timestamp': timestamp.isoformat(),
+            'report_cell': grid_cell(latitude, longitude, self.max_distance_m),
+            'cells': neighbour_cells(latitude, longitude, self.max_distance_m),
+            'max_distance_m': self.max_distance_m,
+            'window_days': self.window_days,
+            'report_image_url': image_url,
+            'report_thumbnail_url': thumbnail_url
+        }).execute()
+        row = result.data[0]
+        return row['incident_id'], row['created']
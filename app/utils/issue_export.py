@@ -0,0 +1,195 @@
+import csv
+import io
+import json
+from datetime import datetime
+from app.utils.issue_types import get_issue_type_names
+from app.utils.repository import get_repository
+
+
+EXPORT_FIELDS = ['id', 'type', 'latitude', 'longitude', 'timestamp']
+
+
+def parse_issue_filters(args):
+    """
+    Read the map's filter params (issue_type, date_from, date_to) from a request.
+
+    Returns:
+        dict: {'issue_type_id': int or None, 'date_from': str or None, 'date_to': str or None}
+
+    Raises:
+        ValueError: If issue_type is not a number
+    """
+    issue_type = args.get('issue_type')
+    return {
+        'issue_type_id': int(issue_type) if issue_type else None,
+        'date_from': args.get('date_from') or None,
+        'date_to': args.get('date_to') or None
+    }
+
+
+def iter_export_rows(filters, page_size):
+    """
+    Yield export rows (dicts keyed by EXPORT_FIELDS) page by page.
+
+    Pages come from the configured repository with keyset pagination; type
+    names are resolved from the cached issue types.
+    """
+    type_names = get_issue_type_names()
+
+    for page in get_repository().export_pages(filters, page_size):
+        yield [{
+            'id': issue['id'],
+            'type': type_names.get(issue['issue_type_id'], 'Unknown'),
+            'latitude': issue['latitude'],
+            'longitude': issue['longitude'],
+            'timestamp': issue['timestamp']
+        } for issue in page]
+
+
+def generate_csv(filters, page_size):
+    """
+    Stream a CSV export as one chunk per page.
+
+    Only the current page is held in memory, so memory stays flat
+    regardless of the table size.
+
+    Yields:
+        str: CSV text (the header first)
+    """
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for rows in iter_export_rows(filters, page_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def generate_ndjson(filters, page_size):
+    """
+    Stream an NDJSON export: one JSON object per issue per line.
+
+    Yields:
+        str: One chunk per page
+    """
+    for rows in iter_export_rows(filters, page_size):
+        yield ''.join(json.dumps(row) + '\n' for row in rows)
+
+
+def _geojson_feature(row):
+    geometry = None
+    if row['latitude'] is not None and row['longitude'] is not None:
+        # GeoJSON positions are [longitude, latitude]
+        geometry = {'type': 'Point', 'coordinates': [float(row['longitude']), float(row['latitude'])]}
+
+    return {
+        'type': 'Feature',
+        'id': row['id'],
+        'geometry': geometry,
+        'properties': {'id': row['id'], 'type': row['type'], 'timestamp': row['timestamp']}
+    }
+
+
+def generate_geojson(filters, page_size):
+    """
+    Stream a GeoJSON FeatureCollection of Point features.
+
+    Issues without coordinates are kept, with a null geometry.
+
+    Yields:
+        str: The collection header, one chunk of features per page, then the footer
+    """
+    yield '{"type": "FeatureCollection", "features": ['
+
+    first = True
+    for rows in iter_export_rows(filters, page_size):
+        features = ',\n'.join(json.dumps(_geojson_feature(row)) for row in rows)
+        yield ('\n' if first else ',\n') + features
+        first = False
+
+    yield '\n]}\n'
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file that hands out what was written since the last take().
+
+    tell() reports the total bytes written, which the Parquet writer uses
+    for the offsets in the file footer.
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parse_export_timestamp(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def generate_parquet(filters, page_size):
+    """
+    Stream a Parquet file with one row group per page.
+
+    Requires pyarrow (imported here so the rest of the app runs without it).
+
+    Yields:
+        bytes: Parquet data; the footer comes with the last chunk
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('type', pa.string()),
+        ('latitude', pa.float64()),
+        ('longitude', pa.float64()),
+        ('timestamp', pa.timestamp('us'))
+    ])
+
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression='snappy')
+    try:
+        for rows in iter_export_rows(filters, page_size):
+            table = pa.table({
+                'id': [row['id'] for row in rows],
+                'type': [row['type'] for row in rows],
+                'latitude': [row['latitude'] for row in rows],
+                'longitude': [row['longitude'] for row in rows],
+                'timestamp': [_parse_export_timestamp(row['timestamp']) for row in rows]
+            }, schema=schema)
+            writer.write_table(table)
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+# format: (generator, mimetype, file extension)
+EXPORT_FORMATS = {
+    'csv': (generate_csv, 'text/csv', 'csv'),
+    'geojson': (generate_geojson, 'application/geo+json', 'geojson'),
+    'ndjson': (generate_ndjson, 'application/x-ndjson', 'ndjson'),
+    'parquet': (generate_parquet, 'application/vnd.apache.parquet', 'parquet')
+}
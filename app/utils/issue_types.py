@@ -0,0 +1,89 @@
+import threading
+import time
+from flask import current_app
+from app.utils.db import get_db
+from app.utils.response_cache import get_data_version
+
+
+_lock = threading.Lock()
+_cache = {'types': None, 'version': None, 'loaded_at': 0.0}
+
+
+def _load():
+    db = get_db()
+    result = db.table('issue_types').select('id, name, active, created_at').order('name').execute()
+    return result.data
+
+
+def _get_all():
+    """
+    Get every issue type, reloading when the cached copy is stale.
+
+    The copy is dropped when the shared data version changes (any worker
+    writing issue types bumps it) or when ISSUE_TYPES_CACHE_TTL expires,
+    whichever comes first.
+    """
+    version = get_data_version()
+    ttl = current_app.config['ISSUE_TYPES_CACHE_TTL']
+
+    with _lock:
+        if (_cache['types'] is not None
+                and _cache['version'] == version
+                and time.time() - _cache['loaded_at'] < ttl):
+            return _cache['types']
+
+    types = _load()
+
+    with _lock:
+        _cache['types'] = types
+        _cache['version'] = version
+        _cache['loaded_at'] = time.time()
+    return types
+
+
+def get_issue_types(active_only=False):
+    """
+    Get issue types ordered by name.
+
+    Args:
+        active_only: Only return active types (for upload and filter dropdowns)
+
+    Returns:
+        list: [{'id', 'name', 'active', 'created_at'}, ...] (copies, safe to modify)
+    """
+    return [dict(t) for t in _get_all() if t['active'] or not active_only]
+
+
+def get_issue_type(type_id):
+    """Get a single issue type by ID, or None if it does not exist."""
+    for issue_type in _get_all():
+        if issue_type['id'] == type_id:
+            return dict(issue_type)
+    return None
+
+
+def get_issue_type_names():
+    """
+    Get a mapping of issue type ID to name, including inactive types.
+
+    Returns:
+        dict: {id: name}
+    """
+    return {t['id']: t['name'] for t in _get_all()}
+
+
+def find_issue_type_ids(term):
+    """Get the IDs of issue types whose name contains term (case-insensitive)."""
+    term = term.lower()
+    return [t['id'] for t in _get_all() if term in t['name'].lower()]
+
+
+def invalidate_issue_types():
+    """
+    Drop this process's cached issue types.
+
+    Call after adding, editing or deleting an issue type, together with
+    bump_data_version() so other workers reload as well.
+    """
+    with _lock:
+        _cache['types'] = None
@@ -0,0 +1,291 @@
+import os
+import shutil
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from flask import current_app
+from werkzeug.utils import secure_filename
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS upload_jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL DEFAULT 'queued',
+    total INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    heartbeat_at TEXT,  -- last sign of life from the worker running the job
+    finished_at TEXT
+);
+
+CREATE INDEX IF NOT EXISTS idx_upload_jobs_status ON upload_jobs(status, created_at);
+
+CREATE TABLE IF NOT EXISTS upload_job_files (
+    job_id TEXT NOT NULL REFERENCES upload_jobs(id) ON DELETE CASCADE,
+    idx INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    spool_path TEXT NOT NULL,
+    issue_type_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    error TEXT,
+    PRIMARY KEY (job_id, idx)
+);
+"""
+
+
+def _connect(path=None):
+    """Open a connection to the queue database, creating it if needed."""
+    path = path or current_app.config['UPLOAD_QUEUE_PATH']
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    # WAL lets web workers read job status while queue workers write
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA foreign_keys=ON')
+    conn.executescript(SCHEMA)
+
+    # Queue databases created before heartbeats were added
+    columns = {row['name'] for row in conn.execute('PRAGMA table_info(upload_jobs)')}
+    if 'heartbeat_at' not in columns:
+        try:
+            conn.execute('ALTER TABLE upload_jobs ADD COLUMN heartbeat_at TEXT')
+        except sqlite3.OperationalError:
+            pass  # added by another process in the meantime
+    return conn
+
+
+def _now():
+    return datetime.now().isoformat()
+
+
+def enqueue_upload_job(files, issue_types):
+    """
+    Persist uploaded files to the spool directory and queue them as one job.
+
+    Args:
+        files: List of uploaded file objects (werkzeug FileStorage)
+        issue_types: List of issue type IDs, one per file
+
+    Returns:
+        str: The new job ID
+    """
+    job_id = uuid.uuid4().hex
+    job_dir = os.path.join(current_app.config['UPLOAD_SPOOL_DIR'], job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    rows = []
+    try:
+        for idx, (file, issue_type_id) in enumerate(zip(files, issue_types)):
+            safe_name = secure_filename(file.filename or '') or 'image.jpg'
+            spool_path = os.path.join(job_dir, f"{idx:04d}_{safe_name}")
+            file.save(spool_path)
+            rows.append((job_id, idx, file.filename, spool_path, int(issue_type_id)))
+    except Exception:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            'INSERT INTO upload_jobs (id, status, total, created_at) VALUES (?, ?, ?, ?)',
+            (job_id, 'queued', len(rows), _now())
+        )
+        conn.executemany(
+            'INSERT INTO upload_job_files (job_id, idx, filename, spool_path, issue_type_id) VALUES (?, ?, ?, ?, ?)',
+            rows
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise
+    finally:
+        conn.close()
+
+    return job_id
+
+
+def claim_next_job():
+    """
+    Atomically take the oldest queued job and mark it as running.
+
+    Safe to call from several worker processes at once: the claim happens
+    inside an immediate (write-locked) transaction.
+
+    Returns:
+        dict or None: {'id': str, 'items': list of pipeline items} or None if the queue is empty.
+            Each item carries its file 'idx' within the job.
+    """
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        row = conn.execute(
+            "SELECT id FROM upload_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            conn.execute('COMMIT')
+            return None
+
+        job_id = row['id']
+        now = _now()
+        conn.execute(
+            "UPDATE upload_jobs SET status = 'running', started_at = ?, heartbeat_at = ? WHERE id = ?",
+            (now, now, job_id)
+        )
+        files = conn.execute(
+            "SELECT idx, filename, spool_path, issue_type_id FROM upload_job_files "
+            "WHERE job_id = ? AND status != 'done' ORDER BY idx",
+            (job_id,)
+        ).fetchall()
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    items = [{
+        'idx': f['idx'],
+        'path': f['spool_path'],
+        'filename': f['filename'],
+        'issue_type_id': f['issue_type_id']
+    } for f in files]
+
+    return {'id': job_id, 'items': items}
+
+
+def update_file_status(job_id, idx, status, error=None):
+    """
+    Record the progress of a single file within a job.
+
+    Also refreshes the job's heartbeat, so a job that keeps making progress
+    is never taken for stale however long it runs. A file already marked
+    done keeps that status: its issue is saved and must not be processed again.
+    """
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute(
+            "UPDATE upload_job_files SET status = ?, error = ? WHERE job_id = ? AND idx = ? AND status != 'done'",
+            (status, error, job_id, idx)
+        )
+        conn.execute('UPDATE upload_jobs SET heartbeat_at = ? WHERE id = ?', (_now(), job_id))
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def finish_job(job_id):
+    """Mark a job as completed and remove its spooled files."""
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        # Anything not finished by now was interrupted by an unexpected error
+        conn.execute(
+            "UPDATE upload_job_files SET status = 'failed', error = 'Processing aborted' "
+            "WHERE job_id = ? AND status IN ('queued', 'processing')",
+            (job_id,)
+        )
+        conn.execute(
+            "UPDATE upload_jobs SET status = 'completed', finished_at = ? WHERE id = ?",
+            (_now(), job_id)
+        )
+        conn.execute('COMMIT')
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+    job_dir = os.path.join(current_app.config['UPLOAD_SPOOL_DIR'], job_id)
+    shutil.rmtree(job_dir, ignore_errors=True)
+
+
+def requeue_stale_jobs(max_age_seconds):
+    """
+    Put running jobs without a heartbeat for max_age_seconds back on the queue.
+
+    Used when a worker process died mid-job. Staleness is measured from the
+    last file progress (the heartbeat), not from the start of the job, so
+    large batches with slow extractions are left alone. Files that were
+    already saved are skipped; a file that was in flight is processed again.
+
+    Returns:
+        int: Number of jobs requeued
+    """
+    cutoff = (datetime.now() - timedelta(seconds=max_age_seconds)).isoformat()
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        stale = conn.execute(
+            "SELECT id FROM upload_jobs WHERE status = 'running' AND COALESCE(heartbeat_at, started_at) < ?",
+            (cutoff,)
+        ).fetchall()
+        for row in stale:
+            conn.execute(
+                "UPDATE upload_jobs SET status = 'queued', started_at = NULL, heartbeat_at = NULL WHERE id = ?",
+                (row['id'],)
+            )
+            conn.execute(
+                "UPDATE upload_job_files SET status = 'queued', error = NULL WHERE job_id = ? AND status != 'done'",
+                (row['id'],)
+            )
+        conn.execute('COMMIT')
+        return len(stale)
+    except Exception:
+        conn.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+
+
+def get_job(job_id):
+    """
+    Get a job with per-file progress.
+
+    Returns:
+        dict or None: {
+            'id': str,
+            'status': 'queued' | 'running' | 'completed',
+            'created_at': str, 'started_at': str or None, 'finished_at': str or None,
+            'total': int, 'processed': int, 'success': int, 'failed': int,
+            'files': list of {'filename': str, 'status': str, 'error': str or None},
+            'failed_details': list of {'filename': str, 'error': str}
+        }
+    """
+    conn = _connect()
+    try:
+        job = conn.execute('SELECT * FROM upload_jobs WHERE id = ?', (job_id,)).fetchone()
+        if job is None:
+            return None
+        files = conn.execute(
+            'SELECT filename, status, error FROM upload_job_files WHERE job_id = ? ORDER BY idx',
+            (job_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+    files = [dict(f) for f in files]
+    success_count = sum(1 for f in files if f['status'] == 'done')
+    failed_details = [{'filename': f['filename'], 'error': f['error']} for f in files if f['status'] == 'failed']
+
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'created_at': job['created_at'],
+        'started_at': job['started_at'],
+        'finished_at': job['finished_at'],
+        'total': job['total'],
+        'processed': success_count + len(failed_details),
+        'success': success_count,
+        'failed': len(failed_details),
+        'files': files,
+        'failed_details': failed_details
+    }
@@ -0,0 +1,107 @@
+import threading
+import time
+from app.utils.exif_extractor import extract_exif_data
+from app.utils.gemini_extractor import extract_watermark_data
+from app.utils.extraction_cache import get_extraction_cache
+
+
+TIERS = ('exif', 'gemini')
+
+_stats_lock = threading.Lock()
+_stats = {tier: {'calls': 0, 'resolved': 0, 'total_seconds': 0.0} for tier in TIERS}
+
+
+def _record(tier, elapsed, resolved):
+    with _stats_lock:
+        _stats[tier]['calls'] += 1
+        _stats[tier]['total_seconds'] += elapsed
+        if resolved:
+            _stats[tier]['resolved'] += 1
+
+
+def extract_metadata(image):
+    """
+    Extract GPS coordinates and timestamp using the cheapest tier that works.
+
+    EXIF is parsed locally first. Gemini is only called when EXIF lacks the
+    GPS position or timestamp; fields Gemini cannot read are then filled in
+    from EXIF where available.
+
+    Args:
+        image: ImageBuffer holding the image
+
+    Returns:
+        dict: {
+            'latitude': float or None,
+            'longitude': float or None,
+            'timestamp': datetime or None,
+            'raw_text': str or None,
+            'source': 'exif' | 'gemini' | 'exif+gemini'
+        }
+    """
+    start = time.perf_counter()
+    with image.stream() as stream:
+        exif_data = extract_exif_data(stream)
+    exif_complete = (
+        exif_data['latitude'] is not None
+        and exif_data['longitude'] is not None
+        and exif_data['timestamp'] is not None
+    )
+    _record('exif', time.perf_counter() - start, exif_complete)
+
+    if exif_complete:
+        return {
+            'latitude': exif_data['latitude'],
+            'longitude': exif_data['longitude'],
+            'timestamp': exif_data['timestamp'],
+            'raw_text': None,
+            'source': 'exif'
+        }
+
+    start = time.perf_counter()
+    result = extract_watermark_data(image)
+    _record('gemini', time.perf_counter() - start,
+            result['latitude'] is not None and result['longitude'] is not None)
+
+    result['source'] = 'gemini'
+
+    # Fill whatever the watermark didn't have from partial EXIF data
+    if (result['latitude'] is None or result['longitude'] is None) and exif_data['latitude'] is not None:
+        result['latitude'] = exif_data['latitude']
+        result['longitude'] = exif_data['longitude']
+        result['source'] = 'exif+gemini'
+    if result['timestamp'] is None and exif_data['timestamp'] is not None:
+        result['timestamp'] = exif_data['timestamp']
+        result['source'] = 'exif+gemini'
+
+    return result
+
+
+def get_extraction_stats():
+    """
+    Get per-tier counters and latency for this process.
+
+    Returns:
+        dict: {
+            'tiers': {tier: {'calls', 'resolved', 'avg_ms'}},
+            'model_calls_avoided': int,
+            'cache': {'hits', 'misses', 'hit_rate'}
+        }
+    """
+    with _stats_lock:
+        snapshot = {tier: dict(values) for tier, values in _stats.items()}
+
+    tiers = {}
+    for tier, values in snapshot.items():
+        calls = values['calls']
+        tiers[tier] = {
+            'calls': calls,
+            'resolved': values['resolved'],
+            'avg_ms': round(values['total_seconds'] * 1000 / calls, 2) if calls else 0.0
+        }
+
+    return {
+        'tiers': tiers,
+        'model_calls_avoided': tiers['exif']['resolved'],
+        'cache': get_extraction_cache().stats()
+    }
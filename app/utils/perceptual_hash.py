@@ -0,0 +1,156 @@
+import threading
+from itertools import combinations
+from PIL import Image, ImageOps
+from app.utils.db import get_db
+
+
+HASH_BITS = 64
+BANDS = 4
+BAND_BITS = HASH_BITS // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+
+def dhash(stream, hash_size=8):
+    """
+    Compute the difference hash (dHash) of an image.
+
+    The image is shrunk to (hash_size + 1) x hash_size greyscale pixels and
+    each bit records whether a pixel is brighter than its right neighbour.
+    Re-encoded, resized or slightly edited copies of a photo end up within
+    a few bits of each other.
+
+    Args:
+        stream: Readable binary stream of the image
+        hash_size: Rows of the hash grid (8 gives a 64-bit hash)
+
+    Returns:
+        int: Unsigned hash of hash_size * hash_size bits
+    """
+    image = Image.open(stream)
+    # Let the JPEG decoder downscale while decoding; much faster on large photos
+    image.draft('L', (hash_size * 8, hash_size * 8))
+    image = ImageOps.exif_transpose(image)
+    image = image.convert('L').resize((hash_size + 1, hash_size), Image.LANCZOS)
+
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(a, b):
+    """Number of differing bits between two hashes."""
+    return bin(a ^ b).count('1')
+
+
+def to_signed(value):
+    """Store a 64-bit unsigned hash in a BIGINT column."""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def from_signed(value):
+    """Read a hash back from a BIGINT column."""
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def split_bands(value):
+    """Split a hash into BANDS 16-bit bands, most significant first."""
+    return [(value >> (BAND_BITS * (BANDS - 1 - i))) & BAND_MASK for i in range(BANDS)]
+
+
+def hash_columns(value):
+    """
+    Get the issue columns for a hash (all None when there is no hash).
+
+    Returns:
+        dict: {'phash', 'phash_b0', 'phash_b1', 'phash_b2', 'phash_b3'}
+    """
+    if value is None:
+        return {'phash': None, **{f'phash_b{i}': None for i in range(BANDS)}}
+    return {'phash': to_signed(value), **{f'phash_b{i}': band for i, band in enumerate(split_bands(value))}}
+
+
+def _band_variants(band, radius):
+    """Every 16-bit value within radius bits of band."""
+    variants = [band]
+    for r in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), r):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            variants.append(flipped)
+    return variants
+
+
+def find_stored_duplicate(value, max_distance):
+    """
+    Find the closest stored issue whose hash is within max_distance bits.
+
+    Uses multi-index hashing: if two 64-bit hashes differ in at most
+    max_distance bits, at least one of their four 16-bit bands differs in at
+    most max_distance // 4 bits. Only issues with such a band (looked up
+    through the band indexes) are compared, so the cost does not grow with
+    the number of stored hashes. The comparison runs in the database
+    (find_duplicate_issue, migration 017), over every candidate.
+
+    Returns:
+        dict or None: Issue row (id, duplicate_of, latitude, longitude,
+            timestamp, extraction_source) plus 'distance'
+    """
+    radius = max_distance // BANDS
+    params = {'target': to_signed(value), 'max_distance': max_distance}
+    for i, band in enumerate(split_bands(value)):
+        params[f'band{i}'] = _band_variants(band, radius)
+
+    # RPC arguments go in the POST body, so the variant lists are not limited by URL length
+    result = get_db().rpc('find_duplicate_issue', params).execute()
+    return result.data[0] if result.data else None
+
+
+class DuplicateIndex:
+    """
+    Near-duplicate detection for one upload batch.
+
+    Checks every file against the stored issues and against the files of
+    the same batch that were checked before it. Safe to share between the
+    pipeline's worker threads.
+    """
+
+    def __init__(self, mode, max_distance):
+        self.mode = mode
+        self.max_distance = max_distance
+        self._batch = []
+        self._lock = threading.Lock()
+
+    def check(self, value, idx):
+        """
+        Look for a near-duplicate of a file and remember the file's hash.
+
+        Args:
+            value: dHash of the file
+            idx: Position of the file in the batch
+
+        Returns:
+            dict or None: {'issue': stored issue row or None,
+                           'batch_idx': earlier file in the batch or None,
+                           'distance': int}
+        """
+        stored = find_stored_duplicate(value, self.max_distance)
+
+        with self._lock:
+            match = None
+            if stored is not None:
+                match = {'issue': stored, 'batch_idx': None, 'distance': stored['distance']}
+            else:
+                for other_value, other_idx in self._batch:
+                    distance = hamming_distance(value, other_value)
+                    if distance <= self.max_distance and (match is None or distance < match['distance']):
+                        match = {'issue': None, 'batch_idx': other_idx, 'distance': distance}
+
+            # Duplicates are remembered too, so later copies still match in 'skip' mode
+            self._batch.append((value, idx))
+
+        return match
@@ -0,0 +1,591 @@
+import os
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from flask import current_app
+from app.utils.db import get_db
+
+
+# Columns returned for map markers and export pages
+MARKER_COLUMNS = ('id', 'issue_type_id', 'latitude', 'longitude', 'timestamp', 'image_url', 'thumbnail_url')
+LIST_COLUMNS = ('id', 'issue_type_id', 'latitude', 'longitude', 'timestamp', 'image_url', 'thumbnail_url', 'extraction_error')
+EXPORT_COLUMNS = ('id', 'issue_type_id', 'latitude', 'longitude', 'timestamp')
+INCIDENT_COLUMNS = (
+    'id', 'issue_type_id', 'latitude', 'longitude', 'first_seen', 'last_seen', 'report_count', 'image_url', 'thumbnail_url'
+)
+
+# Sortable columns of the issues list
+LIST_SORT_COLUMNS = ('id', 'type', 'timestamp')
+
+
+class SupabaseRepository:
+    """
+    Read queries for the heavy API endpoints, through PostgREST.
+
+    Every method returns plain rows shaped like PostgREST's JSON (numbers as
+    numbers, timestamps as ISO strings), so routes work with either backend.
+    """
+
+    @staticmethod
+    def _apply_filters(query, filters):
+        if filters.get('issue_type_id') is not None:
+            query = query.eq('issue_type_id', filters['issue_type_id'])
+        if filters.get('date_from'):
+            query = query.gte('timestamp', filters['date_from'])
+        if filters.get('date_to'):
+            query = query.lte('timestamp', filters['date_to'])
+        return query
+
+    def marker_clusters(self, bbox, cell_size, filters):
+        """
+        Group issues inside a bounding box into grid cells.
+
+        Args:
+            bbox: (min_lat, min_lng, max_lat, max_lng)
+            cell_size: Cell size in degrees
+            filters: {'issue_type_id', 'date_from', 'date_to'}
+
+        Returns:
+            list: [{'lat', 'lng', 'issue_count'}, ...]
+        """
+        min_lat, min_lng, max_lat, max_lng = bbox
+        result = get_db().rpc('issue_marker_clusters', {
+            'min_lat': min_lat,
+            'min_lng': min_lng,
+            'max_lat': max_lat,
+            'max_lng': max_lng,
+            'cell_size': cell_size,
+            'filter_issue_type_id': filters.get('issue_type_id'),
+            'filter_date_from': filters.get('date_from'),
+            'filter_date_to': filters.get('date_to')
+        }).execute()
+        return result.data
+
+    def markers(self, filters, bbox=None, limit=None):
+        """
+        Get issues with valid coordinates for the map, newest first.
+
+        Args:
+            filters: {'issue_type_id', 'date_from', 'date_to'}
+            bbox: Optional (min_lat, min_lng, max_lat, max_lng)
+            limit: Optional maximum number of rows
+
+        Returns:
+            list: Rows with MARKER_COLUMNS
+        """
+        db = get_db()
+
+        if bbox:
+            # Uses the spatial index (migration 011)
+            min_lat, min_lng, max_lat, max_lng = bbox
+            result = db.rpc('issues_in_bbox', {
+                'min_lat': min_lat,
+                'min_lng': min_lng,
+                'max_lat': max_lat,
+                'max_lng': max_lng,
+                'filter_issue_type_id': filters.get('issue_type_id'),
+                'filter_date_from': filters.get('date_from'),
+                'filter_date_to': filters.get('date_to'),
+                'max_rows': limit
+            }).execute()
+            return result.data
+
+        query = db.table('issues').select(', '.join(MARKER_COLUMNS))
+        query = self._apply_filters(query.eq('extraction_error', False), filters)
+        query = query.order('id', desc=True)
+        if limit:
+            query = query.limit(limit)
+
+        return query.execute().data
+
+    def nearby(self, lat, lng, radius_m=None, limit=20, issue_type_id=None):
+        """
+        Get the issues closest to a point, nearest first.
+
+        Args:
+            lat: Latitude of the point
+            lng: Longitude of the point
+            radius_m: Optional search radius in metres
+            limit: Maximum number of rows
+            issue_type_id: Optional issue type filter
+
+        Returns:
+            list: Rows with MARKER_COLUMNS plus 'distance_m'
+        """
+        result = get_db().rpc('issues_nearby', {
+            'lat': lat,
+            'lng': lng,
+            'radius_m': radius_m,
+            'max_rows': limit,
+            'filter_issue_type_id': issue_type_id
+        }).execute()
+        return result.data
+
+    def incident_clusters(self, bbox, cell_size, filters):
+        """
+        Group incidents inside a bounding box into grid cells.
+
+        Args:
+            bbox: (min_lat, min_lng, max_lat, max_lng)
+            cell_size: Cell size in degrees
+            filters: {'issue_type_id', 'date_from', 'date_to'}
+
+        Returns:
+            list: [{'lat', 'lng', 'incident_count'}, ...]
+        """
+        min_lat, min_lng, max_lat, max_lng = bbox
+        result = get_db().rpc('incident_marker_clusters', {
+            'min_lat': min_lat,
+            'min_lng': min_lng,
+            'max_lat': max_lat,
+            'max_lng': max_lng,
+            'cell_size': cell_size,
+            'filter_issue_type_id': filters.get('issue_type_id'),
+            'filter_date_from': filters.get('date_from'),
+            'filter_date_to': filters.get('date_to')
+        }).execute()
+        return result.data
+
+    def incidents(self, filters, bbox=None, limit=None):
+        """
+        Get incidents for the map, most recently reported first.
+
+        Date filters match incidents whose time span overlaps the range.
+
+        Args:
+            filters: {'issue_type_id', 'date_from', 'date_to'}
+            bbox: Optional (min_lat, min_lng, max_lat, max_lng)
+            limit: Optional maximum number of rows
+
+        Returns:
+            list: Rows with INCIDENT_COLUMNS
+        """
+        query = get_db().table('incidents').select(', '.join(INCIDENT_COLUMNS))
+        if filters.get('issue_type_id') is not None:
+            query = query.eq('issue_type_id', filters['issue_type_id'])
+        if filters.get('date_from'):
+            query = query.gte('last_seen', filters['date_from'])
+        if filters.get('date_to'):
+            query = query.lte('first_seen', filters['date_to'])
+        if bbox:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            query = query.gte('latitude', min_lat).lte('latitude', max_lat)
+            query = query.gte('longitude', min_lng).lte('longitude', max_lng)
+
+        query = query.order('last_seen', desc=True).order('id', desc=True)
+        if limit:
+            query = query.limit(limit)
+        return query.execute().data
+
+    def tile(self, z, x, y, filters):
+        """
+        Get one Mapbox Vector Tile of issues.
+
+        Args:
+            z, x, y: Tile coordinates
+            filters: {'issue_type_id', 'date_from', 'date_to'}
+
+        Returns:
+            bytes: Encoded tile (empty if there are no issues in it)
+        """
+        result = get_db().rpc('issue_tile', {
+            'z': z,
+            'x': x,
+            'y': y,
+            'filter_issue_type_id': filters.get('issue_type_id'),
+            'filter_date_from': filters.get('date_from'),
+            'filter_date_to': filters.get('date_to')
+        }).execute()
+
+        # PostgREST returns bytea as a hex string ("\\x1a2b...")
+        data = result.data or ''
+        return bytes.fromhex(data[2:] if data.startswith('\\x') else data)
+
+    def list_issues(self, offset, limit, sort='id', desc=True, search_type_ids=None, search_id=None, count_mode='exact'):
+        """
+        Get one page of the issues list.
+
+        Args:
+            offset: Rows to skip
+            limit: Rows per page
+            sort: One of LIST_SORT_COLUMNS
+            desc: Sort descending
+            search_type_ids: Match issues of these types (None for no search)
+            search_id: Match the issue with this ID (None for no search)
+            count_mode: 'exact', 'planned' or 'estimated'
+
+        Returns:
+            dict: {'rows': list, 'filtered': int, 'total': int}
+        """
+        db = get_db()
+        searching = search_type_ids is not None or search_id is not None
+
+        columns = ', '.join(LIST_COLUMNS)
+        if sort == 'type':
+            # PostgREST can only order by a related column that is embedded
+            columns += ', issue_types(name)'
+        query = db.table('issues').select(columns, count=count_mode)
+
+        if searching:
+            conditions = []
+            if search_type_ids:
+                conditions.append(f"issue_type_id.in.({','.join(str(i) for i in search_type_ids)})")
+            if search_id is not None:
+                conditions.append(f'id.eq.{int(search_id)}')
+            if not conditions:
+                return {'rows': [], 'filtered': 0, 'total': self._count_all(count_mode)}
+            query = query.or_(','.join(conditions))
+
+        if sort == 'type':
+            query = query.order('name', desc=desc, foreign_table='issue_types')
+        elif sort == 'timestamp':
+            query = query.order('timestamp', desc=desc)
+        if sort != 'id':
+            # Stable paging when the sort column has duplicates
+            query = query.order('id', desc=True)
+        else:
+            query = query.order('id', desc=desc)
+
+        result = query.range(offset, offset + limit - 1).execute()
+        filtered = result.count or 0
+
+        rows = result.data
+        for row in rows:
+            row.pop('issue_types', None)
+
+        return {
+            'rows': rows,
+            'filtered': filtered,
+            'total': self._count_all(count_mode) if searching else filtered
+        }
+
+    @staticmethod
+    def _count_all(count_mode):
+        result = get_db().table('issues').select('id', count=count_mode).limit(1).execute()
+        return result.count or 0
+
+    def summary_stats(self, recent_since):
+        """Get the issue_summary_stats row (or an empty dict)."""
+        result = get_db().rpc('issue_summary_stats', {'recent_since': recent_since}).execute()
+        return result.data[0] if result.data else {}
+
+    def counts_by_type(self):
+        """Get [{'issue_type_id', 'type_name', 'issue_count'}, ...]."""
+        return get_db().rpc('issue_counts_by_type').execute().data
+
+    def counts_by_month(self):
+        """Get [{'month', 'issue_type_id', 'type_name', 'issue_count'}, ...]."""
+        return get_db().rpc('issue_counts_by_month').execute().data
+
+    def incident_counts_by_type(self):
+        """Like counts_by_type, counting incidents instead of reports."""
+        return get_db().rpc('incident_counts_by_type').execute().data
+
+    def incident_counts_by_month(self):
+        """Like counts_by_month, counting incidents in the month they were first seen."""
+        return get_db().rpc('incident_counts_by_month').execute().data
+
+    def export_pages(self, filters, page_size):
+        """
+        Page through matching issues, newest first, with keyset pagination.
+
+        Each page continues from the last ID seen (id < last_id) instead of an
+        OFFSET, so every page costs the same however deep the export goes.
+
+        Yields:
+            list: Rows with EXPORT_COLUMNS, at most page_size per page
+        """
+        db = get_db()
+        last_id = None
+
+        while True:
+            query = self._apply_filters(db.table('issues').select(', '.join(EXPORT_COLUMNS)), filters)
+            if last_id is not None:
+                query = query.lt('id', last_id)
+            rows = query.order('id', desc=True).limit(page_size).execute().data
+
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['id']
+
+
+def _json_value(value):
+    # Match what PostgREST returns, so templates and JSON stay the same
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class PostgresRepository:
+    """
+    Read queries for the heavy API endpoints, straight to Postgres.
+
+    Uses a psycopg connection pool shared by the worker process. Statements
+    are prepared on first use unless DB_PREPARED_STATEMENTS is off (needed
+    behind transaction-mode poolers such as Supavisor on port 6543).
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def _fetch(self, query, params=None):
+        with self.pool.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [{key: _json_value(value) for key, value in row.items()} for row in rows]
+
+    @staticmethod
+    def _filter_conditions(filters, conditions, params):
+        if filters.get('issue_type_id') is not None:
+            conditions.append('i.issue_type_id = %(issue_type_id)s')
+            params['issue_type_id'] = filters['issue_type_id']
+        if filters.get('date_from'):
+            conditions.append('i.timestamp >= %(date_from)s::timestamp')
+            params['date_from'] = filters['date_from']
+        if filters.get('date_to'):
+            conditions.append('i.timestamp <= %(date_to)s::timestamp')
+            params['date_to'] = filters['date_to']
+
+    @staticmethod
+    def _select(columns):
+        return ', '.join(f'i.{c}' for c in columns)
+
+    def marker_clusters(self, bbox, cell_size, filters):
+        min_lat, min_lng, max_lat, max_lng = bbox
+        return self._fetch(
+            'SELECT lat, lng, issue_count FROM issue_marker_clusters('
+            '%s, %s, %s, %s, %s, %s, %s::timestamp, %s::timestamp)',
+            (min_lat, min_lng, max_lat, max_lng, cell_size,
+             filters.get('issue_type_id'), filters.get('date_from'), filters.get('date_to'))
+        )
+
+    def markers(self, filters, bbox=None, limit=None):
+        if bbox:
+            min_lat, min_lng, max_lat, max_lng = bbox
+            return self._fetch(
+                f"SELECT {', '.join(MARKER_COLUMNS)} FROM issues_in_bbox("
+                '%s, %s, %s, %s, %s, %s::timestamp, %s::timestamp, %s)',
+                (min_lat, min_lng, max_lat, max_lng, filters.get('issue_type_id'),
+                 filters.get('date_from'), filters.get('date_to'), limit)
+            )
+
+        conditions = ['i.extraction_error = FALSE']
+        params = {}
+        self._filter_conditions(filters, conditions, params)
+
+        query = f"SELECT {self._select(MARKER_COLUMNS)} FROM issues i WHERE {' AND '.join(conditions)} ORDER BY i.id DESC"
+        if limit:
+            query += ' LIMIT %(limit)s'
+            params['limit'] = limit
+        return self._fetch(query, params)
+
+    def nearby(self, lat, lng, radius_m=None, limit=20, issue_type_id=None):
+        return self._fetch(
+            f"SELECT {', '.join(MARKER_COLUMNS)}, distance_m FROM issues_nearby(%s, %s, %s, %s, %s)",
+            (lat, lng, radius_m, limit, issue_type_id)
+        )
+
+    def incident_clusters(self, bbox, cell_size, filters):
+        min_lat, min_lng, max_lat, max_lng = bbox
+        return self._fetch(
+            'SELECT lat, lng, incident_count FROM incident_marker_clusters('
+            '%s, %s, %s, %s, %s, %s, %s::timestamp, %s::timestamp)',
+            (min_lat, min_lng, max_lat, max_lng, cell_size,
+             filters.get('issue_type_id'), filters.get('date_from'), filters.get('date_to'))
+        )
+
+    def incidents(self, filters, bbox=None, limit=None):
+        conditions = ['TRUE']
+        params = {}
+        if filters.get('issue_type_id') is not None:
+            conditions.append('c.issue_type_id = %(issue_type_id)s')
+            params['issue_type_id'] = filters['issue_type_id']
+        if filters.get('date_from'):
+            conditions.append('c.last_seen >= %(date_from)s::timestamp')
+            params['date_from'] = filters['date_from']
+        if filters.get('date_to'):
+            conditions.append('c.first_seen <= %(date_to)s::timestamp')
+            params['date_to'] = filters['date_to']
+        if bbox:
+            conditions.append('c.latitude BETWEEN %(min_lat)s AND %(max_lat)s')
+            conditions.append('c.longitude BETWEEN %(min_lng)s AND %(max_lng)s')
+            params.update(zip(('min_lat', 'min_lng', 'max_lat', 'max_lng'), bbox))
+
+        columns = ', '.join(f'c.{c}' for c in INCIDENT_COLUMNS)
+        query = f"SELECT {columns} FROM incidents c WHERE {' AND '.join(conditions)} ORDER BY c.last_seen DESC, c.id DESC"
+        if limit:
+            query += ' LIMIT %(limit)s'
+            params['limit'] = limit
+        return self._fetch(query, params)
+
+    def tile(self, z, x, y, filters):
+        with self.pool.connection() as conn:
+            row = conn.execute(
+                'SELECT issue_tile(%s, %s, %s, %s, %s::timestamp, %s::timestamp) AS tile',
+                (z, x, y, filters.get('issue_type_id'), filters.get('date_from'), filters.get('date_to'))
+            ).fetchone()
+        return bytes(row['tile'] or b'')
+
+    def list_issues(self, offset, limit, sort='id', desc=True, search_type_ids=None, search_id=None, count_mode='exact'):
+        searching = search_type_ids is not None or search_id is not None
+        params = {'offset': offset, 'limit': limit}
+
+        where = ''
+        if searching:
+            conditions = []
+            if search_type_ids:
+                conditions.append('i.issue_type_id = ANY(%(type_ids)s)')
+                params['type_ids'] = list(search_type_ids)
+            if search_id is not None:
+                conditions.append('i.id = %(issue_id)s')
+                params['issue_id'] = int(search_id)
+            if not conditions:
+                return {'rows': [], 'filtered': 0, 'total': self._count_all(count_mode)}
+            where = f"WHERE {' OR '.join(conditions)}"
+
+        direction = 'DESC' if desc else 'ASC'
+        join = ''
+        if sort == 'type':
+            join = 'LEFT JOIN issue_types t ON t.id = i.issue_type_id'
+            order = f't.name {direction}, i.id DESC'
+        elif sort == 'timestamp':
+            order = f'i.timestamp {direction}, i.id DESC'
+        else:
+            order = f'i.id {direction}'
+
+        rows = self._fetch(
+            f"SELECT {self._select(LIST_COLUMNS)} FROM issues i {join} {where} "
+            f"ORDER BY {order} LIMIT %(limit)s OFFSET %(offset)s",
+            params
+        )
+
+        total = self._count_all(count_mode)
+        if searching:
+            filtered = self._fetch(f'SELECT COUNT(*) AS count FROM issues i {where}', params)[0]['count']
+        else:
+            filtered = total
+
+        return {'rows': rows, 'filtered': filtered, 'total': total}
+
+    def _count_all(self, count_mode):
+        if count_mode != 'exact':
+            # Planner estimate; -1 until the table has been analyzed
+            estimate = self._fetch("SELECT reltuples::BIGINT AS count FROM pg_class WHERE oid = 'issues'::regclass")
+            if estimate and estimate[0]['count'] >= 0:
+                return estimate[0]['count']
+        return self._fetch('SELECT COUNT(*) AS count FROM issues')[0]['count']
+
+    def summary_stats(self, recent_since):
+        rows = self._fetch('SELECT * FROM issue_summary_stats(%s::timestamp)', (recent_since,))
+        return rows[0] if rows else {}
+
+    def counts_by_type(self):
+        return self._fetch('SELECT * FROM issue_counts_by_type()')
+
+    def counts_by_month(self):
+        return self._fetch('SELECT * FROM issue_counts_by_month()')
+
+    def incident_counts_by_type(self):
+        return self._fetch('SELECT * FROM incident_counts_by_type()')
+
+    def incident_counts_by_month(self):
+        return self._fetch('SELECT * FROM incident_counts_by_month()')
+
+    def export_pages(self, filters, page_size):
+        conditions = []
+        params = {'page_size': page_size}
+        self._filter_conditions(filters, conditions, params)
+
+        base = f"SELECT {self._select(EXPORT_COLUMNS)} FROM issues i"
+        first_page = base + (f" WHERE {' AND '.join(conditions)}" if conditions else '')
+        next_page = f"{base} WHERE {' AND '.join(conditions + ['i.id < %(last_id)s'])}"
+        order = ' ORDER BY i.id DESC LIMIT %(page_size)s'
+
+        last_id = None
+        while True:
+            if last_id is None:
+                rows = self._fetch(first_page + order, params)
+            else:
+                rows = self._fetch(next_page + order, {**params, 'last_id': last_id})
+
+            if not rows:
+                return
+            yield rows
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1]['id']
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _reset_pool():
+    """Drop the shared pool so a forked worker opens its own connections."""
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+# Connections must not be shared between processes
+os.register_at_fork(after_in_child=_reset_pool)
+
+
+def _create_pool(config):
+    # Imported here so the Supabase-only setup does not need psycopg installed
+    from psycopg.conninfo import make_conninfo
+    from psycopg.rows import dict_row
+    from psycopg_pool import ConnectionPool
+
+    conninfo = make_conninfo(
+        host=config['DB_HOST'],
+        port=config['DB_PORT'],
+        dbname=config['DB_NAME'],
+        user=config['DB_USER'],
+        password=config['DB_PASSWORD'],
+        sslmode=config['DB_SSLMODE']
+    )
+
+    return ConnectionPool(
+        conninfo,
+        min_size=config['DB_POOL_MIN_SIZE'],
+        max_size=config['DB_POOL_MAX_SIZE'],
+        timeout=config['DB_POOL_TIMEOUT'],
+        kwargs={
+            'autocommit': True,
+            'row_factory': dict_row,
+            # 0 prepares every statement on its first execution, None never prepares
+            'prepare_threshold': 0 if config['DB_PREPARED_STATEMENTS'] else None
+        },
+        name='issues-mapper',
+        open=True
+    )
+
+
+def get_pool():
+    """Get the process-wide Postgres connection pool, creating it on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = _create_pool(current_app.config)
+    return _pool
+
+
+def get_repository():
+    """
+    Get the repository for the configured DATA_BACKEND.
+
+    Returns:
+        SupabaseRepository or PostgresRepository
+    """
+    backend = current_app.config['DATA_BACKEND']
+    if backend == 'supabase':
+        return SupabaseRepository()
+    if backend == 'postgres':
+        return PostgresRepository(get_pool())
+    raise ValueError(f"Unknown DATA_BACKEND: {backend}")
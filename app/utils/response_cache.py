@@ -0,0 +1,296 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, request, Response
+
+
+# Separate entry stores with their own size limits, so panning the map (a
+# new tile per request) cannot evict the statistics and marker responses.
+# name -> config key of its maximum entries. The data version is shared.
+STORES = {
+    'response': 'RESPONSE_CACHE_MAX_ENTRIES',
+    'tile': 'TILE_CACHE_MAX_ENTRIES'
+}
+
+
+class MemoryCacheBackend:
+    """
+    In-process LRU cache with per-entry expiry.
+
+    The data version lives in this process only, so invalidations made by
+    other gunicorn workers are only picked up when entries expire.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+            # Entries keyed on the old version can never be read again
+            self._entries.clear()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SQLiteCacheBackend:
+    """
+    Cache shared by every process on the host through a SQLite file.
+
+    The data version is stored alongside the entries, so a bump from any
+    web or upload worker invalidates the cache for all of them. Each store
+    keeps its entries in its own table of the same file.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS {table} (
+        key TEXT PRIMARY KEY,
+        body BLOB NOT NULL,
+        mimetype TEXT NOT NULL,
+        expires_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_{table}_last_used ON {table}(last_used);
+
+    CREATE TABLE IF NOT EXISTS cache_meta (
+        name TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    );
+    """
+
+    # A hit refreshes an entry's LRU position at most this often, so most
+    # hits are read-only and do not take SQLite's write lock
+    TOUCH_INTERVAL = 30  # seconds
+
+    def __init__(self, path, max_entries, table='response_cache'):
+        self.path = path
+        self.max_entries = max_entries
+        self.table = table
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+
+        if not self._initialized:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(self.SCHEMA.format(table=self.table))
+            self._initialized = True
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                f'SELECT body, mimetype, expires_at, last_used FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+            now = time.time()
+            # Expired entries are left for set() to replace or evict
+            if row is None or row[2] < now:
+                return None
+            if now - row[3] >= self.TOUCH_INTERVAL:
+                conn.execute(f'UPDATE {self.table} SET last_used = ? WHERE key = ?', (now, key))
+            return (bytes(row[0]), row[1])
+        finally:
+            conn.close()
+
+    def set(self, key, value, ttl):
+        body, mimetype = value
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, body, mimetype, expires_at, last_used) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (key, body, mimetype, now + ttl, now)
+            )
+            count = conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            if count > self.max_entries:
+                # Expired entries go first, then the least recently used
+                conn.execute(
+                    f'DELETE FROM {self.table} WHERE key IN '
+                    f'(SELECT key FROM {self.table} ORDER BY expires_at < ? DESC, last_used LIMIT ?)',
+                    (now, count - self.max_entries)
+                )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def get_version(self):
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM cache_meta WHERE name = 'data_version'").fetchone()
+            return row[0] if row else 0
+        finally:
+            conn.close()
+
+    def bump_version(self):
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                "INSERT INTO cache_meta (name, value) VALUES ('data_version', 1) "
+                "ON CONFLICT (name) DO UPDATE SET value = value + 1"
+            )
+            # Entries keyed on the old version can never be read again
+            conn.execute(f'DELETE FROM {self.table}')
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute(f'DELETE FROM {self.table}')
+        finally:
+            conn.close()
+
+
+def _create_backend(config, store):
+    backend = config['RESPONSE_CACHE_BACKEND']
+    max_entries = config[STORES[store]]
+    if backend == 'memory':
+        return MemoryCacheBackend(max_entries)
+    if backend == 'sqlite':
+        return SQLiteCacheBackend(config['RESPONSE_CACHE_PATH'], max_entries, table=f'{store}_cache')
+    if backend == 'none':
+        return None
+    raise ValueError(f"Unknown RESPONSE_CACHE_BACKEND: {backend}")
+
+
+def get_cache(store='response'):
+    """
+    Get a cache store of the current app (None if caching is disabled).
+
+    The 'response' store also holds the data version shared by all stores.
+    """
+    return current_app.extensions.get(f'{store}_cache')
+
+
+def get_data_version():
+    """Get the current data version (0 when caching is disabled)."""
+    cache = get_cache()
+    if cache is None:
+        return 0
+    try:
+        return cache.get_version()
+    except Exception as e:
+        print(f"WARNING: response cache version lookup failed: {e}")
+        return 0
+
+
+def bump_data_version():
+    """
+    Invalidate every cached response.
+
+    Call after any write that changes issues or issue types.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.bump_version()
+        # Entries of the other stores are keyed on the old version too
+        for store in STORES:
+            if store != 'response':
+                get_cache(store).clear()
+    except Exception as e:
+        print(f"WARNING: response cache invalidation failed: {e}")
+
+
+def _cache_key(version):
+    # Normalize query params: drop empty values, sort so parameter order doesn't matter
+    params = sorted((k, v) for k, v in request.args.items(multi=True) if v != '')
+    query = '&'.join(f"{k}={v}" for k, v in params)
+    # Path rather than endpoint, so URL parameters (e.g. tile coordinates) are part of the key
+    return f"{version}:{request.path}?{query}"
+
+
+def cached_response(ttl=None, store='response'):
+    """
+    Cache successful responses of a view, keyed by path and query params.
+
+    Place it below @login_required so authentication is always checked.
+
+    Args:
+        ttl: Seconds to keep a response. Defaults to RESPONSE_CACHE_TTL.
+        store: One of STORES to keep the responses in
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            cache = get_cache(store)
+            if cache is None:
+                return f(*args, **kwargs)
+
+            try:
+                key = _cache_key(get_cache().get_version())
+                cached = cache.get(key)
+            except Exception as e:
+                print(f"WARNING: response cache lookup failed: {e}")
+                return f(*args, **kwargs)
+
+            if cached is not None:
+                body, mimetype = cached
+                response = Response(body, mimetype=mimetype)
+                response.headers['X-Cache'] = 'HIT'
+                return response
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code == 200 and not response.is_streamed:
+                try:
+                    cache.set(key, (response.get_data(), response.mimetype),
+                              ttl or current_app.config['RESPONSE_CACHE_TTL'])
+                except Exception as e:
+                    print(f"WARNING: response cache store failed: {e}")
+            response.headers['X-Cache'] = 'MISS'
+            return response
+        return decorated_function
+    return decorator
+
+
+def init_app(app):
+    """Create the cache stores of the backend configured for the app."""
+    for store in STORES:
+        app.extensions[f'{store}_cache'] = _create_backend(app.config, store)
@@ -1,15 +1,19 @@
 import os
+import mimetypes
 from datetime import datetime
 from app.utils.db import get_db
 
 
-def upload_image_to_storage(file, filename=None):
+def upload_image_to_storage(file, filename=None, source_name=None, content_type=None, upsert=False):
     """
     Upload an image file to Supabase Storage.
 
     Args:
-        file: File object or file path
+        file: File object, file path or image bytes
         filename: Optional custom filename. If not provided, generates one.
+        source_name: Original filename, used for the extension when file is raw bytes
+        content_type: Optional MIME type. If not provided, guessed from the filename.
+        upsert: Overwrite an existing object at the same path instead of failing
 
     Returns:
         dict: {
@@ -25,28 +29,50 @@ def upload_image_to_storage(file, filename=None):
         # Generate filename if not provided
         if not filename:
             timestamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
-            ext = os.path.splitext(file.filename)[1] if hasattr(file, 'filename') else '.jpg'
+            if hasattr(file, 'filename'):
+                ext = os.path.splitext(file.filename)[1]
+            elif isinstance(file, (bytes, bytearray, memoryview)):
+                ext = os.path.splitext(source_name or '')[1] or '.jpg'
+            else:
+                ext = os.path.splitext(str(file))[1] or '.jpg'
             filename = f"{timestamp}{ext}"
 
+        if not content_type:
+            content_type = mimetypes.guess_type(filename)[0] or 'image/jpeg'
+
+        file_options = {'content-type': content_type}
+        if upsert:
+            file_options['upsert'] = 'true'
+
         # Supabase storage bucket name
         bucket_name = 'issues'
 
         # Upload file to Supabase Storage
-        if hasattr(file, 'read'):
+        if isinstance(file, (bytes, bytearray, memoryview)):
+            # Already in memory
+            file_data = bytes(file) if not isinstance(file, bytes) else file
+        elif hasattr(file, 'read'):
             # File object
             file_data = file.read()
             file.seek(0)  # Reset file pointer for potential re-use
         else:
-            # File path
-            with open(file, 'rb') as f:
-                file_data = f.read()
+            # File path - streamed from disk rather than read into memory
+            file_data = None
 
         # Upload to storage
-        result = db.storage.from_(bucket_name).upload(
-            path=filename,
-            file=file_data,
-            file_options={'content-type': 'image/jpeg'}
-        )
+        if file_data is None:
+            with open(file, 'rb') as f:
+                db.storage.from_(bucket_name).upload(
+                    path=filename,
+                    file=f,
+                    file_options=file_options
+                )
+        else:
+            db.storage.from_(bucket_name).upload(
+                path=filename,
+                file=file_data,
+                file_options=file_options
+            )
 
         # Get public URL
         public_url = db.storage.from_(bucket_name).get_public_url(filename)
@@ -67,6 +93,40 @@ def upload_image_to_storage(file, filename=None):
         }
 
 
+def download_image_from_storage(image_path):
+    """
+    Download an image from Supabase Storage.
+
+    Args:
+        image_path: Path to the image in storage (just the filename)
+
+    Returns:
+        dict: {
+            'success': bool,
+            'data': bytes or None,
+            'error': str or None
+        }
+    """
+    try:
+        db = get_db()
+        bucket_name = 'issues'
+
+        data = db.storage.from_(bucket_name).download(image_path)
+
+        return {
+            'success': True,
+            'data': data,
+            'error': None
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'data': None,
+            'error': str(e)
+        }
+
+
 def delete_image_from_storage(image_path):
     """
     Delete an image from Supabase Storage.
@@ -0,0 +1,374 @@
+import os
+import traceback
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from flask import current_app
+from app.utils.db import get_db
+from app.utils.image_buffer import ImageBuffer
+from app.utils.metadata_extractor import extract_metadata
+from app.utils.perceptual_hash import dhash, hash_columns, DuplicateIndex
+from app.utils.incidents import IncidentMatcher, drop_empty_incidents
+from app.utils.image_derivatives import store_derivatives, derivative_columns
+from app.utils.response_cache import bump_data_version
+from app.utils.storage import upload_image_to_storage
+
+
+def process_uploaded_files(files, issue_types, max_workers=None):
+    """
+    Process files received in the current request.
+
+    Args:
+        files: List of uploaded file objects (werkzeug FileStorage)
+        issue_types: List of issue type IDs, one per file
+        max_workers: Concurrency limit. Defaults to UPLOAD_CONCURRENCY.
+
+    Returns:
+        dict: Same shape as process_files()
+    """
+    items = [{
+        'file': file,
+        'filename': file.filename,
+        'issue_type_id': issue_type_id
+    } for file, issue_type_id in zip(files, issue_types)]
+
+    return process_files(items, max_workers=max_workers)
+
+
+def process_files(items, max_workers=None, on_progress=None, batch_size=None):
+    """
+    Process a batch of image files with bounded concurrency.
+
+    Extraction and storage upload for different files run at the same time
+    on a thread pool; each file is still handled independently so one
+    failure does not affect the rest of the batch. Finished rows are
+    collected and written with one bulk insert per batch_size files.
+
+    Near-duplicates of stored issues or of other files in the batch are
+    flagged or skipped according to DUPLICATE_DETECTION, and with
+    INCIDENT_MERGING on each located report joins a nearby incident of
+    the same type (or starts one).
+
+    Args:
+        items: List of {'filename': str, 'issue_type_id': int or str} with either
+            'file' (an uploaded FileStorage) or 'path' (an image file on disk)
+        max_workers: Concurrency limit. Defaults to UPLOAD_CONCURRENCY.
+        on_progress: Optional callback(idx, status, error) called with
+            'processing' when a file starts (from a worker thread) and
+            'done' or 'failed' once its outcome is final.
+        batch_size: Maximum rows per bulk insert. Defaults to UPLOAD_INSERT_BATCH_SIZE.
+
+    Returns:
+        dict: {
+            'success': int,
+            'failed': int,
+            'total': int,
+            'failed_details': list of {'filename': str, 'error': str}
+        }
+    """
+    app = current_app._get_current_object()
+    if max_workers is None:
+        max_workers = app.config.get('UPLOAD_CONCURRENCY', 4)
+    max_workers = max(1, min(max_workers, len(items) or 1))
+    if batch_size is None:
+        batch_size = app.config.get('UPLOAD_INSERT_BATCH_SIZE', 50)
+    batch_size = max(1, batch_size)
+    spill_threshold = app.config.get('UPLOAD_SPILL_THRESHOLD', 4 * 1024 * 1024)
+
+    duplicate_mode = app.config.get('DUPLICATE_DETECTION', 'flag')
+    duplicates = None
+    if duplicate_mode != 'off':
+        duplicates = DuplicateIndex(duplicate_mode, app.config.get('DUPLICATE_MAX_DISTANCE', 6))
+
+    incidents = None
+    if app.config.get('INCIDENT_MERGING', True):
+        incidents = IncidentMatcher(
+            app.config.get('INCIDENT_MAX_DISTANCE', 50),
+            app.config.get('INCIDENT_TIME_WINDOW_DAYS', 30)
+        )
+
+    def run(idx):
+        item = items[idx]
+        # Worker threads do not inherit the caller's app context
+        with app.app_context():
+            if on_progress:
+                on_progress(idx, 'processing', None)
+            return prepare_file(item, spill_threshold, idx, len(items), duplicates, incidents)
+
+    def report(indexes):
+        if on_progress:
+            for i in indexes:
+                on_progress(i, 'done' if outcomes[i]['success'] else 'failed', outcomes[i]['error'])
+
+    outcomes = [None] * len(items)
+    pending = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run, idx): idx for idx in range(len(items))}
+        for future in as_completed(futures):
+            idx = futures[future]
+            outcomes[idx] = future.result()
+
+            if not outcomes[idx]['success']:
+                report([idx])
+                continue
+
+            pending.append(idx)
+            if len(pending) >= batch_size:
+                _insert_rows([outcomes[i] for i in pending])
+                report(pending)
+                pending = []
+
+    if pending:
+        _insert_rows([outcomes[i] for i in pending])
+        report(pending)
+
+    _link_batch_duplicates(outcomes)
+
+    # Incidents started for files whose row could not be saved
+    created = [o['new_incident_id'] for o in outcomes if o.get('new_incident_id')]
+    try:
+        drop_empty_incidents(created)
+    except Exception as e:
+        print(f"✗ Error removing empty incidents: {e}")
+
+    if any(outcome['success'] for outcome in outcomes):
+        # New issues change statistics and markers
+        bump_data_version()
+
+    success_count = 0
+    failed_details = []
+    for outcome in outcomes:
+        if outcome['success']:
+            success_count += 1
+        else:
+            failed_details.append({
+                'filename': outcome['filename'],
+                'error': outcome['error']
+            })
+
+    return {
+        'success': success_count,
+        'failed': len(failed_details),
+        'total': len(items),
+        'failed_details': failed_details
+    }
+
+
+def _insert_rows(outcomes):
+    """
+    Save prepared issue rows with a single bulk insert.
+
+    If the bulk insert fails, rows are retried one by one so only the
+    offending files are reported as failed. Outcomes are updated in place.
+    """
+    db = get_db()
+    try:
+        result = db.table('issues').insert([o['issue_data'] for o in outcomes]).execute()
+        # Rows come back in insert order
+        for outcome, row in zip(outcomes, result.data):
+            outcome['issue_id'] = row['id']
+        print(f"✓ Saved {len(outcomes)} issue(s) to database")
+        return
+    except Exception as e:
+        print(f"✗ Bulk insert of {len(outcomes)} issue(s) failed, retrying one by one: {e}")
+
+    for outcome in outcomes:
+        try:
+            result = db.table('issues').insert(outcome['issue_data']).execute()
+            outcome['issue_id'] = result.data[0]['id']
+        except Exception as e:
+            print(f"✗ Error saving {outcome['filename']}: {e}")
+            outcome['success'] = False
+            outcome['error'] = f"Database insert failed: {str(e)}"
+
+
+def _link_batch_duplicates(outcomes):
+    """
+    Point flagged near-duplicates of files from the same batch at the saved issue.
+
+    Their originals had no issue ID yet when they were checked.
+    """
+    db = get_db()
+    for outcome in outcomes:
+        original_idx = outcome.get('duplicate_of_idx')
+        if not outcome['success'] or original_idx is None:
+            continue
+
+        original = outcomes[original_idx]
+        if not original['success']:
+            continue
+
+        # Chains collapse onto the first copy
+        original_id = original['issue_data']['duplicate_of'] or original.get('issue_id')
+        try:
+            db.table('issues').update({'duplicate_of': original_id}).eq('id', outcome['issue_id']).execute()
+        except Exception as e:
+            print(f"✗ Error flagging {outcome['filename']} as duplicate: {e}")
+
+
+def _load_image(item, spill_threshold):
+    """Read an item's image once into an ImageBuffer."""
+    if 'file' in item:
+        ext = os.path.splitext(item['filename'] or '')[1] or '.jpg'
+        return ImageBuffer.from_stream(item['file'].stream, spill_threshold, suffix=ext)
+    return ImageBuffer.from_path(item['path'], spill_threshold)
+
+
+def prepare_file(item, spill_threshold, idx=0, total=1, duplicates=None, incidents=None):
+    """
+    Extract metadata from a single image, store it and build its issue row.
+
+    The image is read once into memory (or memory-mapped from disk above
+    spill_threshold) and that buffer is shared by extraction and storage.
+
+    Args:
+        item: {'filename': str, 'issue_type_id': int or str} plus 'file' or 'path'
+        spill_threshold: Size in bytes above which the image is kept on disk
+        idx: Position of the file in the batch (for logging)
+        total: Number of files in the batch (for logging)
+        duplicates: Optional DuplicateIndex of the batch
+        incidents: Optional IncidentMatcher of the batch
+
+    Returns:
+        dict: {
+            'success': bool,
+            'filename': str,
+            'error': str or None,
+            'issue_data': dict or None (row to insert into issues),
+            'duplicate_of_idx': int or None (earlier file of the batch this one duplicates),
+            'new_incident_id': int or None (incident started for this file)
+        }
+    """
+    filename = item['filename']
+    issue_type_id = item['issue_type_id']
+    tag = f"[{idx + 1}/{total} {filename}]"
+    image = None
+
+    try:
+        image = _load_image(item, spill_threshold)
+        print(f"{tag} Processing file, issue type ID: {issue_type_id}")
+
+        # Look for near-duplicates before spending an extraction on the file
+        phash = None
+        duplicate = None
+        if duplicates is not None:
+            try:
+                with image.stream() as stream:
+                    phash = dhash(stream)
+                duplicate = duplicates.check(phash, idx)
+            except Exception as e:
+                print(f"{tag} ⚠ Duplicate check failed, continuing without it: {e}")
+
+        if duplicate:
+            if duplicate['issue']:
+                original = f"issue #{duplicate['issue']['duplicate_of'] or duplicate['issue']['id']}"
+            else:
+                original = f"file {duplicate['batch_idx'] + 1} of this upload"
+            if duplicates.mode == 'skip':
+                raise Exception(f"Near-duplicate of {original} ({duplicate['distance']} bits apart)")
+            print(f"{tag} ⚠ Near-duplicate of {original} ({duplicate['distance']} bits apart), flagging")
+
+        stored = duplicate['issue'] if duplicate else None
+        if stored and stored['latitude'] is not None and stored['longitude'] is not None:
+            # Same photo as a stored issue: reuse its location instead of extracting again
+            extracted_data = {
+                'latitude': stored['latitude'],
+                'longitude': stored['longitude'],
+                'timestamp': datetime.fromisoformat(stored['timestamp']) if stored['timestamp'] else None,
+                'raw_text': None,
+                'source': 'duplicate'
+            }
+        else:
+            # Extract GPS and timestamp (EXIF first, Gemini as fallback)
+            print(f"{tag} Starting extraction...")
+            extracted_data = extract_metadata(image)
+
+        latitude = extracted_data.get('latitude')
+        longitude = extracted_data.get('longitude')
+        timestamp = extracted_data.get('timestamp')
+        raw_text = extracted_data.get('raw_text')
+        source = extracted_data.get('source')
+
+        print(f"{tag} ✓ Extraction complete ({source}): lat={latitude}, lon={longitude}, timestamp={timestamp}")
+
+        # Upload image to Supabase Storage
+        print(f"{tag} Uploading to Supabase Storage...")
+        payload = image.path if image.spilled else image.getvalue()
+        storage_result = upload_image_to_storage(payload, source_name=filename)
+
+        if not storage_result['success']:
+            raise Exception(f"Storage upload failed: {storage_result['error']}")
+
+        print(f"{tag} ✓ Image uploaded to storage: {storage_result['path']}")
+
+        # Smaller copies for the list, map and detail views; pages fall back to the original without them
+        derivatives = None
+        try:
+            with image.stream() as stream:
+                derivatives = store_derivatives(stream, storage_result['path'], current_app.config)
+            print(f"{tag} ✓ Stored {', '.join(derivatives)} copies")
+        except Exception as e:
+            print(f"{tag} ⚠ Could not create resized copies: {e}")
+        derivative_data = derivative_columns(derivatives)
+
+        # Check if extraction was successful
+        has_error = latitude is None or longitude is None
+
+        # Repeated reports of the same issue are merged into one incident
+        incident_id = None
+        new_incident_id = None
+        if incidents is not None and not has_error and timestamp:
+            try:
+                incident_id, created = incidents.assign(
+                    int(issue_type_id), latitude, longitude, timestamp,
+                    storage_result['url'], derivative_data['thumbnail_url']
+                )
+                if created:
+                    new_incident_id = incident_id
+                print(f"{tag} ✓ {'Started' if created else 'Joined'} incident #{incident_id}")
+            except Exception as e:
+                print(f"{tag} ⚠ Incident lookup failed, saving without one: {e}")
+
+        # Row is saved to the database in bulk by process_files
+        issue_data = {
+            'issue_type_id': int(issue_type_id),
+            'latitude': latitude,
+            'longitude': longitude,
+            'timestamp': timestamp.isoformat() if timestamp else None,
+            'image_url': storage_result['url'],
+            'image_path': storage_result['path'],
+            **derivative_data,
+            'extraction_error': has_error,
+            'error_message': 'Failed to extract GPS coordinates' if has_error else None,
+            'raw_extraction_text': raw_text,
+            'extraction_source': source,
+            'duplicate_of': (stored['duplicate_of'] or stored['id']) if stored else None,
+            'incident_id': incident_id,
+            **hash_columns(phash)
+        }
+
+        return {
+            'success': True,
+            'filename': filename,
+            'error': None,
+            'issue_data': issue_data,
+            'duplicate_of_idx': duplicate['batch_idx'] if duplicate else None,
+            'new_incident_id': new_incident_id
+        }
+
+    except Exception as e:
+        error_msg = str(e)
+        print(f"{tag} ✗ Error processing file: {error_msg}")
+        traceback.print_exc()
+        return {
+            'success': False,
+            'filename': filename,
+            'error': error_msg,
+            'issue_data': None,
+            'duplicate_of_idx': None,
+            'new_incident_id': None
+        }
+
+    finally:
+        if image is not None:
+            image.close()
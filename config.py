@@ -12,6 +12,10 @@ class Config:
     SUPABASE_URL = os.getenv('SUPABASE_URL')
     SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY')
     SUPABASE_SERVICE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
+    SUPABASE_POOL_SIZE = int(os.getenv('SUPABASE_POOL_SIZE', 10))  # HTTP connections per worker process
+    SUPABASE_POOL_KEEPALIVE = float(os.getenv('SUPABASE_POOL_KEEPALIVE', 30))  # seconds an idle connection is kept
+    SUPABASE_POSTGREST_TIMEOUT = float(os.getenv('SUPABASE_POSTGREST_TIMEOUT', 30))  # seconds
+    SUPABASE_STORAGE_TIMEOUT = int(os.getenv('SUPABASE_STORAGE_TIMEOUT', 60))  # seconds
 
     # Database
     DB_HOST = os.getenv('DB_HOST')
@@ -19,10 +23,83 @@ class Config:
     DB_NAME = os.getenv('DB_NAME', 'postgres')
     DB_USER = os.getenv('DB_USER', 'postgres')
     DB_PASSWORD = os.getenv('SUPABASE_DB_PASSWORD')
+    DB_SSLMODE = os.getenv('DB_SSLMODE', 'prefer')
+
+    # Backend for the heavy read endpoints (markers, issues list, statistics, export):
+    # 'supabase' goes through PostgREST, 'postgres' connects directly with the DB_* settings
+    DATA_BACKEND = os.getenv('DATA_BACKEND', 'supabase')
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', 1))
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # seconds to wait for a free connection
+    # Prepare statements on first use; turn off behind transaction-mode poolers (port 6543)
+    DB_PREPARED_STATEMENTS = os.getenv('DB_PREPARED_STATEMENTS', 'true').lower() == 'true'
 
     # Upload settings
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', 4))  # files processed in parallel per request
+    UPLOAD_INSERT_BATCH_SIZE = int(os.getenv('UPLOAD_INSERT_BATCH_SIZE', 50))  # issues per bulk insert
+    UPLOAD_SPILL_THRESHOLD = int(os.getenv('UPLOAD_SPILL_THRESHOLD', 4 * 1024 * 1024))  # bytes kept in memory per image
+
+    # Resized WebP copies stored with every photo (maximum width/height in pixels)
+    IMAGE_THUMBNAIL_SIZE = int(os.getenv('IMAGE_THUMBNAIL_SIZE', 200))  # list, map popups
+    IMAGE_DISPLAY_SIZE = int(os.getenv('IMAGE_DISPLAY_SIZE', 1280))  # detail page
+    IMAGE_DERIVATIVE_QUALITY = int(os.getenv('IMAGE_DERIVATIVE_QUALITY', 80))
+
+    # Near-duplicate photos: 'flag' (save and link to the original), 'skip' (reject) or 'off'
+    DUPLICATE_DETECTION = os.getenv('DUPLICATE_DETECTION', 'flag')
+    # Differing bits of the 64-bit image hash. Capped at 15: the lookup sends every band value
+    # within DUPLICATE_MAX_DISTANCE // 4 bits (697 per band at 12-15) in its POST body,
+    # which grows combinatorially beyond that.
+    DUPLICATE_MAX_DISTANCE = min(int(os.getenv('DUPLICATE_MAX_DISTANCE', 6)), 15)
+
+    # Merge reports of the same type within this distance and time window into one incident
+    INCIDENT_MERGING = os.getenv('INCIDENT_MERGING', 'true').lower() == 'true'
+    INCIDENT_MAX_DISTANCE = float(os.getenv('INCIDENT_MAX_DISTANCE', 50))  # metres, also the lookup grid cell size
+    INCIDENT_TIME_WINDOW_DAYS = int(os.getenv('INCIDENT_TIME_WINDOW_DAYS', 30))
+
+    # Row count mode for the issues list: 'exact', 'planned' or 'estimated'
+    ISSUES_LIST_COUNT = os.getenv('ISSUES_LIST_COUNT', 'exact')
+
+    # Rows fetched per request when streaming exports
+    EXPORT_PAGE_SIZE = int(os.getenv('EXPORT_PAGE_SIZE', 1000))
+
+    # Gemini extraction results cached by image content hash (0 max entries disables it)
+    EXTRACTION_CACHE_PATH = os.getenv('EXTRACTION_CACHE_PATH', 'data/extraction_cache.db')
+    EXTRACTION_CACHE_MAX_ENTRIES = int(os.getenv('EXTRACTION_CACHE_MAX_ENTRIES', 10000))
+
+    # Response cache for statistics and map APIs: 'sqlite' (shared by all workers), 'memory' or 'none'
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'sqlite')
+    RESPONSE_CACHE_PATH = os.getenv('RESPONSE_CACHE_PATH', 'data/response_cache.db')
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 60))  # seconds
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1000))
+    TILE_CACHE_MAX_ENTRIES = int(os.getenv('TILE_CACHE_MAX_ENTRIES', 2000))  # vector tiles, kept apart from the above
+
+    # In-process issue types cache; also reloaded whenever the response cache data version changes
+    ISSUE_TYPES_CACHE_TTL = int(os.getenv('ISSUE_TYPES_CACHE_TTL', 300))  # seconds
+
+    # Map markers: cluster below this zoom level, cap individual markers per viewport
+    MAP_CLUSTER_MAX_ZOOM = int(os.getenv('MAP_CLUSTER_MAX_ZOOM', 15))
+    MAP_MAX_MARKERS = int(os.getenv('MAP_MAX_MARKERS', 2000))
+    MAP_TILE_MAX_AGE = int(os.getenv('MAP_TILE_MAX_AGE', 300))  # seconds browsers may reuse a vector tile
+
+    # Create the Gemini model when the app starts instead of on first upload
+    GEMINI_WARMUP = os.getenv('GEMINI_WARMUP', 'false').lower() == 'true'
+
+    # Send only the bottom watermark band (downscaled) to Gemini, full frame as fallback.
+    # Off until scripts/compare_gemini_crop.py shows no accuracy loss on real uploads.
+    GEMINI_CROP_ENABLED = os.getenv('GEMINI_CROP_ENABLED', 'false').lower() == 'true'
+    GEMINI_CROP_FRACTION = float(os.getenv('GEMINI_CROP_FRACTION', 0.35))  # bottom share of the frame
+    GEMINI_MAX_DIMENSION = int(os.getenv('GEMINI_MAX_DIMENSION', 1280))  # pixels
+    GEMINI_JPEG_QUALITY = int(os.getenv('GEMINI_JPEG_QUALITY', 85))
+
+    # Background upload jobs
+    UPLOAD_QUEUE_ENABLED = os.getenv('UPLOAD_QUEUE_ENABLED', 'false').lower() == 'true'
+    UPLOAD_QUEUE_PATH = os.getenv('UPLOAD_QUEUE_PATH', 'data/upload_jobs.db')
+    UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', 'data/upload_spool')
+    UPLOAD_WORKER_POLL_INTERVAL = float(os.getenv('UPLOAD_WORKER_POLL_INTERVAL', 1.0))  # seconds
+    UPLOAD_JOB_STALE_SECONDS = int(os.getenv('UPLOAD_JOB_STALE_SECONDS', 900))  # seconds without file progress before a job is requeued
+    UPLOAD_JOB_STALE_CHECK_INTERVAL = int(os.getenv('UPLOAD_JOB_STALE_CHECK_INTERVAL', 60))  # seconds between stale job checks
 
     @property
     def DATABASE_URL(self):
@@ -0,0 +1,5 @@
+-- Record which extraction tier produced an issue's coordinates and timestamp
+
+-- 'exif' (camera metadata), 'gemini' (watermark read by the model) or 'exif+gemini';
+-- migration 013 adds 'duplicate' and 016 restricts the column to these values
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS extraction_source VARCHAR(20);
@@ -0,0 +1,33 @@
+-- Viewport queries and server-side clustering for the map
+
+-- Bounding-box lookups only ever look at issues with valid coordinates
+CREATE INDEX IF NOT EXISTS idx_issues_lat_lng ON issues(latitude, longitude) WHERE extraction_error = FALSE;
+
+-- Group the issues inside a bounding box into grid cells of cell_size degrees.
+-- Returns one row per non-empty cell with the average position and the number of issues.
+CREATE OR REPLACE FUNCTION issue_marker_clusters(
+    min_lat DOUBLE PRECISION,
+    min_lng DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    max_lng DOUBLE PRECISION,
+    cell_size DOUBLE PRECISION,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL
+)
+RETURNS TABLE (lat DOUBLE PRECISION, lng DOUBLE PRECISION, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        AVG(latitude)::DOUBLE PRECISION AS lat,
+        AVG(longitude)::DOUBLE PRECISION AS lng,
+        COUNT(*) AS issue_count
+    FROM issues
+    WHERE extraction_error = FALSE
+      AND latitude BETWEEN min_lat AND max_lat
+      AND longitude BETWEEN min_lng AND max_lng
+      AND (filter_issue_type_id IS NULL OR issue_type_id = filter_issue_type_id)
+      AND (filter_date_from IS NULL OR timestamp >= filter_date_from)
+      AND (filter_date_to IS NULL OR timestamp <= filter_date_to)
+    GROUP BY FLOOR(latitude / cell_size), FLOOR(longitude / cell_size);
+$$;
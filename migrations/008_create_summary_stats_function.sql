@@ -0,0 +1,18 @@
+-- All statistics summary figures in one pass over issues
+
+CREATE OR REPLACE FUNCTION issue_summary_stats(recent_since TIMESTAMP)
+RETURNS TABLE (
+    total_issues BIGINT,
+    successful_extractions BIGINT,
+    failed_extractions BIGINT,
+    recent_issues BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        COUNT(*) AS total_issues,
+        COUNT(*) FILTER (WHERE extraction_error = FALSE) AS successful_extractions,
+        COUNT(*) FILTER (WHERE extraction_error = TRUE) AS failed_extractions,
+        COUNT(*) FILTER (WHERE created_at >= recent_since) AS recent_issues
+    FROM issues;
+$$;
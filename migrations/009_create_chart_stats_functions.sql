@@ -0,0 +1,30 @@
+-- Server-side aggregation for the statistics charts
+
+-- Number of issues per issue type
+CREATE OR REPLACE FUNCTION issue_counts_by_type()
+RETURNS TABLE (issue_type_id INTEGER, type_name VARCHAR, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT i.issue_type_id, t.name AS type_name, COUNT(*) AS issue_count
+    FROM issues i
+    LEFT JOIN issue_types t ON t.id = i.issue_type_id
+    GROUP BY i.issue_type_id, t.name
+    ORDER BY t.name;
+$$;
+
+-- Number of issues per issue type and month of the issue timestamp
+CREATE OR REPLACE FUNCTION issue_counts_by_month()
+RETURNS TABLE (month DATE, issue_type_id INTEGER, type_name VARCHAR, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        date_trunc('month', i.timestamp)::DATE AS month,
+        i.issue_type_id,
+        t.name AS type_name,
+        COUNT(*) AS issue_count
+    FROM issues i
+    LEFT JOIN issue_types t ON t.id = i.issue_type_id
+    WHERE i.timestamp IS NOT NULL
+    GROUP BY 1, i.issue_type_id, t.name
+    ORDER BY 1;
+$$;
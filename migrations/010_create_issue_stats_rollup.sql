@@ -0,0 +1,168 @@
+-- Daily rollup of issue counts, maintained incrementally by triggers
+-- Requires PostgreSQL 15+ (UNIQUE NULLS NOT DISTINCT)
+
+CREATE TABLE IF NOT EXISTS issue_stats_daily (
+    issue_type_id INTEGER NOT NULL,
+    day DATE,  -- date of the issue timestamp, NULL when it could not be extracted
+    extraction_error BOOLEAN NOT NULL,
+    issue_count BIGINT NOT NULL DEFAULT 0,
+    UNIQUE NULLS NOT DISTINCT (issue_type_id, day, extraction_error)
+);
+
+-- The "last 7 days" figure is counted from issues directly
+CREATE INDEX IF NOT EXISTS idx_issues_created_at ON issues(created_at);
+
+-- Statement-level triggers see all rows of a bulk insert at once,
+-- so a batch upload costs one upsert per (type, day, error) group
+
+CREATE OR REPLACE FUNCTION issue_stats_daily_after_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO issue_stats_daily (issue_type_id, day, extraction_error, issue_count)
+    SELECT issue_type_id, timestamp::DATE, COALESCE(extraction_error, FALSE), COUNT(*)
+    FROM new_rows
+    GROUP BY 1, 2, 3
+    ON CONFLICT (issue_type_id, day, extraction_error)
+    DO UPDATE SET issue_count = issue_stats_daily.issue_count + EXCLUDED.issue_count;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION issue_stats_daily_after_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    UPDATE issue_stats_daily s
+    SET issue_count = s.issue_count - d.issue_count
+    FROM (
+        SELECT issue_type_id, timestamp::DATE AS day, COALESCE(extraction_error, FALSE) AS extraction_error, COUNT(*) AS issue_count
+        FROM old_rows
+        GROUP BY 1, 2, 3
+    ) d
+    WHERE s.issue_type_id = d.issue_type_id
+      AND s.day IS NOT DISTINCT FROM d.day
+      AND s.extraction_error = d.extraction_error;
+
+    DELETE FROM issue_stats_daily WHERE issue_count <= 0;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION issue_stats_daily_after_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    INSERT INTO issue_stats_daily (issue_type_id, day, extraction_error, issue_count)
+    SELECT issue_type_id, day, extraction_error, SUM(delta)
+    FROM (
+        SELECT issue_type_id, timestamp::DATE AS day, COALESCE(extraction_error, FALSE) AS extraction_error, 1 AS delta
+        FROM new_rows
+        UNION ALL
+        SELECT issue_type_id, timestamp::DATE, COALESCE(extraction_error, FALSE), -1
+        FROM old_rows
+    ) changes
+    GROUP BY 1, 2, 3
+    HAVING SUM(delta) <> 0
+    ON CONFLICT (issue_type_id, day, extraction_error)
+    DO UPDATE SET issue_count = issue_stats_daily.issue_count + EXCLUDED.issue_count;
+
+    DELETE FROM issue_stats_daily WHERE issue_count <= 0;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS issue_stats_daily_insert ON issues;
+CREATE TRIGGER issue_stats_daily_insert
+    AFTER INSERT ON issues
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION issue_stats_daily_after_insert();
+
+DROP TRIGGER IF EXISTS issue_stats_daily_delete ON issues;
+CREATE TRIGGER issue_stats_daily_delete
+    AFTER DELETE ON issues
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION issue_stats_daily_after_delete();
+
+DROP TRIGGER IF EXISTS issue_stats_daily_update ON issues;
+CREATE TRIGGER issue_stats_daily_update
+    AFTER UPDATE ON issues
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION issue_stats_daily_after_update();
+
+-- Recompute the rollup from scratch (recovers from drift)
+CREATE OR REPLACE FUNCTION rebuild_issue_stats_daily()
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    group_count BIGINT;
+BEGIN
+    -- Block writers so no trigger delta is lost while rebuilding
+    LOCK TABLE issues IN SHARE MODE;
+
+    DELETE FROM issue_stats_daily;
+
+    INSERT INTO issue_stats_daily (issue_type_id, day, extraction_error, issue_count)
+    SELECT issue_type_id, timestamp::DATE, COALESCE(extraction_error, FALSE), COUNT(*)
+    FROM issues
+    GROUP BY 1, 2, 3;
+
+    GET DIAGNOSTICS group_count = ROW_COUNT;
+    RETURN group_count;
+END;
+$$;
+
+SELECT rebuild_issue_stats_daily();
+
+-- Statistics functions now read from the rollup
+
+CREATE OR REPLACE FUNCTION issue_summary_stats(recent_since TIMESTAMP)
+RETURNS TABLE (
+    total_issues BIGINT,
+    successful_extractions BIGINT,
+    failed_extractions BIGINT,
+    recent_issues BIGINT
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        COALESCE(SUM(issue_count), 0)::BIGINT AS total_issues,
+        COALESCE(SUM(issue_count) FILTER (WHERE extraction_error = FALSE), 0)::BIGINT AS successful_extractions,
+        COALESCE(SUM(issue_count) FILTER (WHERE extraction_error = TRUE), 0)::BIGINT AS failed_extractions,
+        (SELECT COUNT(*) FROM issues WHERE created_at >= recent_since) AS recent_issues
+    FROM issue_stats_daily;
+$$;
+
+CREATE OR REPLACE FUNCTION issue_counts_by_type()
+RETURNS TABLE (issue_type_id INTEGER, type_name VARCHAR, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT s.issue_type_id, t.name AS type_name, SUM(s.issue_count)::BIGINT AS issue_count
+    FROM issue_stats_daily s
+    LEFT JOIN issue_types t ON t.id = s.issue_type_id
+    GROUP BY s.issue_type_id, t.name
+    ORDER BY t.name;
+$$;
+
+CREATE OR REPLACE FUNCTION issue_counts_by_month()
+RETURNS TABLE (month DATE, issue_type_id INTEGER, type_name VARCHAR, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        date_trunc('month', s.day)::DATE AS month,
+        s.issue_type_id,
+        t.name AS type_name,
+        SUM(s.issue_count)::BIGINT AS issue_count
+    FROM issue_stats_daily s
+    LEFT JOIN issue_types t ON t.id = s.issue_type_id
+    WHERE s.day IS NOT NULL
+    GROUP BY 1, s.issue_type_id, t.name
+    ORDER BY 1;
+$$;
@@ -0,0 +1,119 @@
+-- Spatial index on issue coordinates for bounding-box and radius queries
+-- Requires PostGIS (enable it under Database > Extensions in Supabase, or let this migration do it)
+
+CREATE EXTENSION IF NOT EXISTS postgis WITH SCHEMA extensions;
+
+SET search_path = public, extensions;
+
+-- Computed from latitude/longitude, so every insert or update (including the
+-- upload pipeline's bulk inserts) fills it in, and existing rows are backfilled
+-- when the column is added. NULL for issues without coordinates.
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS location GEOGRAPHY(Point, 4326)
+    GENERATED ALWAYS AS (
+        CASE WHEN latitude IS NOT NULL AND longitude IS NOT NULL
+            THEN ST_SetSRID(ST_MakePoint(longitude::DOUBLE PRECISION, latitude::DOUBLE PRECISION), 4326)::GEOGRAPHY
+        END
+    ) STORED;
+
+-- Distance and nearest-neighbour lookups
+CREATE INDEX IF NOT EXISTS idx_issues_location ON issues USING GIST (location);
+
+-- Bounding-box lookups. Boxes are compared as planar geometry so their edges
+-- follow parallels and meridians, and viewports wider than 180 degrees still work.
+CREATE INDEX IF NOT EXISTS idx_issues_location_geometry ON issues USING GIST ((location::GEOMETRY));
+
+-- Issues inside a bounding box, newest first
+CREATE OR REPLACE FUNCTION issues_in_bbox(
+    min_lat DOUBLE PRECISION,
+    min_lng DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    max_lng DOUBLE PRECISION,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL,
+    max_rows INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    id INTEGER,
+    issue_type_id INTEGER,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    "timestamp" TIMESTAMP,
+    image_url TEXT
+)
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    SELECT i.id, i.issue_type_id, i.latitude::DOUBLE PRECISION, i.longitude::DOUBLE PRECISION, i.timestamp, i.image_url
+    FROM issues i
+    WHERE i.extraction_error = FALSE
+      AND i.location::GEOMETRY && ST_MakeEnvelope(min_lng, min_lat, max_lng, max_lat, 4326)
+      AND (filter_issue_type_id IS NULL OR i.issue_type_id = filter_issue_type_id)
+      AND (filter_date_from IS NULL OR i.timestamp >= filter_date_from)
+      AND (filter_date_to IS NULL OR i.timestamp <= filter_date_to)
+    ORDER BY i.id DESC
+    LIMIT max_rows;
+$$;
+
+-- Issues closest to a point, nearest first, optionally within radius_m metres.
+-- ORDER BY <-> is a k-nearest-neighbour scan on the GiST index.
+CREATE OR REPLACE FUNCTION issues_nearby(
+    lat DOUBLE PRECISION,
+    lng DOUBLE PRECISION,
+    radius_m DOUBLE PRECISION DEFAULT NULL,
+    max_rows INTEGER DEFAULT 20,
+    filter_issue_type_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    id INTEGER,
+    issue_type_id INTEGER,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    "timestamp" TIMESTAMP,
+    image_url TEXT,
+    distance_m DOUBLE PRECISION
+)
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    SELECT
+        i.id, i.issue_type_id, i.latitude::DOUBLE PRECISION, i.longitude::DOUBLE PRECISION, i.timestamp, i.image_url,
+        ST_Distance(i.location, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::GEOGRAPHY) AS distance_m
+    FROM issues i
+    WHERE i.extraction_error = FALSE
+      AND i.location IS NOT NULL
+      AND (radius_m IS NULL OR ST_DWithin(i.location, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::GEOGRAPHY, radius_m))
+      AND (filter_issue_type_id IS NULL OR i.issue_type_id = filter_issue_type_id)
+    ORDER BY i.location <-> ST_SetSRID(ST_MakePoint(lng, lat), 4326)::GEOGRAPHY
+    LIMIT max_rows;
+$$;
+
+-- Map clusters now use the spatial index to find the issues in the viewport
+CREATE OR REPLACE FUNCTION issue_marker_clusters(
+    min_lat DOUBLE PRECISION,
+    min_lng DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    max_lng DOUBLE PRECISION,
+    cell_size DOUBLE PRECISION,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL
+)
+RETURNS TABLE (lat DOUBLE PRECISION, lng DOUBLE PRECISION, issue_count BIGINT)
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    SELECT
+        AVG(latitude)::DOUBLE PRECISION AS lat,
+        AVG(longitude)::DOUBLE PRECISION AS lng,
+        COUNT(*) AS issue_count
+    FROM issues
+    WHERE extraction_error = FALSE
+      AND location::GEOMETRY && ST_MakeEnvelope(min_lng, min_lat, max_lng, max_lat, 4326)
+      AND (filter_issue_type_id IS NULL OR issue_type_id = filter_issue_type_id)
+      AND (filter_date_from IS NULL OR timestamp >= filter_date_from)
+      AND (filter_date_to IS NULL OR timestamp <= filter_date_to)
+    GROUP BY FLOOR(latitude / cell_size), FLOOR(longitude / cell_size);
+$$;
+
+RESET search_path;
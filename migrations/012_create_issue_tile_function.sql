@@ -0,0 +1,41 @@
+-- Mapbox Vector Tiles of issues for the map
+-- Requires PostGIS 3.0+ (ST_TileEnvelope) and the location column from migration 011
+
+-- One tile of the 'issues' layer in Web Mercator (z/x/y as in slippy map URLs).
+-- Each point carries id, issue_type_id, type, timestamp and image_url attributes.
+CREATE OR REPLACE FUNCTION issue_tile(
+    z INTEGER,
+    x INTEGER,
+    y INTEGER,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL
+)
+RETURNS BYTEA
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(z, x, y) AS geom
+    ),
+    features AS (
+        SELECT
+            i.id,
+            i.issue_type_id,
+            t.name AS type,
+            to_char(i.timestamp, 'YYYY-MM-DD"T"HH24:MI:SS') AS timestamp,
+            i.image_url,
+            ST_AsMVTGeom(ST_Transform(i.location::GEOMETRY, 3857), bounds.geom) AS geom
+        FROM bounds, issues i
+        LEFT JOIN issue_types t ON t.id = i.issue_type_id
+        WHERE i.extraction_error = FALSE
+          -- Uses the location::geometry index from migration 011
+          AND i.location::GEOMETRY && ST_Transform(bounds.geom, 4326)
+          AND (filter_issue_type_id IS NULL OR i.issue_type_id = filter_issue_type_id)
+          AND (filter_date_from IS NULL OR i.timestamp >= filter_date_from)
+          AND (filter_date_to IS NULL OR i.timestamp <= filter_date_to)
+    )
+    SELECT COALESCE(ST_AsMVT(features, 'issues', 4096, 'geom'), ''::BYTEA)
+    FROM features
+    WHERE geom IS NOT NULL;
+$$;
@@ -0,0 +1,24 @@
+-- Perceptual image hashes for near-duplicate detection at upload
+
+-- 64-bit dHash of the photo, stored as a signed BIGINT
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS phash BIGINT;
+
+-- The hash split into four 16-bit bands. Two hashes within N bits of each
+-- other share at least one band within N / 4 bits, so candidates are found
+-- with a handful of B-tree lookups instead of comparing every stored hash.
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS phash_b0 INTEGER;
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS phash_b1 INTEGER;
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS phash_b2 INTEGER;
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS phash_b3 INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_issues_phash_b0 ON issues(phash_b0);
+CREATE INDEX IF NOT EXISTS idx_issues_phash_b1 ON issues(phash_b1);
+CREATE INDEX IF NOT EXISTS idx_issues_phash_b2 ON issues(phash_b2);
+CREATE INDEX IF NOT EXISTS idx_issues_phash_b3 ON issues(phash_b3);
+
+-- Original issue of a flagged near-duplicate
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS duplicate_of INTEGER REFERENCES issues(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_issues_duplicate_of ON issues(duplicate_of) WHERE duplicate_of IS NOT NULL;
+
+COMMENT ON COLUMN issues.duplicate_of IS 'Issue this photo is a near-duplicate of (NULL if it is not a duplicate)';
@@ -0,0 +1,179 @@
+-- Incidents: repeated reports of the same issue merged into one
+-- Requires PostgreSQL 10+ (transition tables)
+
+-- Reports of the same type close together in space and time belong to one
+-- incident. The upload pipeline finds an incident through its grid cell
+-- (see app/utils/incidents.py) and saves the report with its ID.
+CREATE TABLE IF NOT EXISTS incidents (
+    id SERIAL PRIMARY KEY,
+    issue_type_id INTEGER NOT NULL REFERENCES issue_types(id) ON DELETE RESTRICT,
+    grid_cell VARCHAR(32) NOT NULL,  -- 'row:column' cell of the location
+    latitude DECIMAL(10, 8) NOT NULL,  -- location of the first report
+    longitude DECIMAL(11, 8) NOT NULL,
+    first_seen TIMESTAMP NOT NULL,
+    last_seen TIMESTAMP NOT NULL,
+    report_count INTEGER NOT NULL DEFAULT 0,
+    image_url TEXT,  -- photo of the first report
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Neighbour-cell lookups at upload
+CREATE INDEX IF NOT EXISTS idx_incidents_cell ON incidents(issue_type_id, grid_cell, last_seen);
+
+-- Viewport queries for the map
+CREATE INDEX IF NOT EXISTS idx_incidents_lat_lng ON incidents(latitude, longitude);
+
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS incident_id INTEGER REFERENCES incidents(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_issues_incident_id ON issues(incident_id) WHERE incident_id IS NOT NULL;
+
+-- Recompute report counts and time spans of some incidents from their
+-- reports, and drop the ones left without any
+CREATE OR REPLACE FUNCTION recount_incidents(incident_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    UPDATE incidents c
+    SET report_count = s.report_count,
+        first_seen = COALESCE(s.first_seen, c.first_seen),
+        last_seen = COALESCE(s.last_seen, c.last_seen)
+    FROM (
+        SELECT incident_id, COUNT(*) AS report_count, MIN(timestamp) AS first_seen, MAX(timestamp) AS last_seen
+        FROM issues
+        WHERE incident_id = ANY(incident_ids)
+        GROUP BY incident_id
+    ) s
+    WHERE c.id = s.incident_id;
+
+    DELETE FROM incidents c
+    WHERE c.id = ANY(incident_ids)
+      AND NOT EXISTS (SELECT 1 FROM issues i WHERE i.incident_id = c.id);
+$$;
+
+-- Statement-level triggers, as for the statistics rollup: a bulk insert
+-- costs one update per incident it touches
+
+CREATE OR REPLACE FUNCTION incidents_after_issue_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Incremental, so concurrent uploads into one incident do not overwrite each other
+    UPDATE incidents c
+    SET report_count = c.report_count + n.report_count,
+        first_seen = LEAST(c.first_seen, n.first_seen),
+        last_seen = GREATEST(c.last_seen, n.last_seen)
+    FROM (
+        SELECT incident_id, COUNT(*) AS report_count, MIN(timestamp) AS first_seen, MAX(timestamp) AS last_seen
+        FROM new_rows
+        WHERE incident_id IS NOT NULL
+        GROUP BY incident_id
+    ) n
+    WHERE c.id = n.incident_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION incidents_after_issue_delete()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    PERFORM recount_incidents(ARRAY(SELECT DISTINCT incident_id FROM old_rows WHERE incident_id IS NOT NULL));
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION incidents_after_issue_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Only rows that moved to another incident or changed their timestamp matter
+    PERFORM recount_incidents(ARRAY(
+        SELECT DISTINCT unnest(ARRAY[o.incident_id, n.incident_id])
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE o.incident_id IS DISTINCT FROM n.incident_id
+           OR (n.incident_id IS NOT NULL AND o.timestamp IS DISTINCT FROM n.timestamp)
+    ));
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS incidents_issue_insert ON issues;
+CREATE TRIGGER incidents_issue_insert
+    AFTER INSERT ON issues
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incidents_after_issue_insert();
+
+DROP TRIGGER IF EXISTS incidents_issue_delete ON issues;
+CREATE TRIGGER incidents_issue_delete
+    AFTER DELETE ON issues
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incidents_after_issue_delete();
+
+DROP TRIGGER IF EXISTS incidents_issue_update ON issues;
+CREATE TRIGGER incidents_issue_update
+    AFTER UPDATE ON issues
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION incidents_after_issue_update();
+
+-- Map clusters of incidents; same grid as issue_marker_clusters.
+-- Date filters match incidents whose time span overlaps the range.
+CREATE OR REPLACE FUNCTION incident_marker_clusters(
+    min_lat DOUBLE PRECISION,
+    min_lng DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    max_lng DOUBLE PRECISION,
+    cell_size DOUBLE PRECISION,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL
+)
+RETURNS TABLE (lat DOUBLE PRECISION, lng DOUBLE PRECISION, incident_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        AVG(latitude)::DOUBLE PRECISION AS lat,
+        AVG(longitude)::DOUBLE PRECISION AS lng,
+        COUNT(*) AS incident_count
+    FROM incidents
+    WHERE latitude BETWEEN min_lat AND max_lat
+      AND longitude BETWEEN min_lng AND max_lng
+      AND (filter_issue_type_id IS NULL OR issue_type_id = filter_issue_type_id)
+      AND (filter_date_from IS NULL OR last_seen >= filter_date_from)
+      AND (filter_date_to IS NULL OR first_seen <= filter_date_to)
+    GROUP BY FLOOR(latitude / cell_size), FLOOR(longitude / cell_size);
+$$;
+
+-- Incident counts for the statistics charts, shaped like issue_counts_by_type
+-- and issue_counts_by_month (incidents are counted in the month first seen)
+CREATE OR REPLACE FUNCTION incident_counts_by_type()
+RETURNS TABLE (issue_type_id INTEGER, type_name VARCHAR, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT c.issue_type_id, t.name AS type_name, COUNT(*) AS issue_count
+    FROM incidents c
+    LEFT JOIN issue_types t ON t.id = c.issue_type_id
+    GROUP BY c.issue_type_id, t.name
+    ORDER BY t.name;
+$$;
+
+CREATE OR REPLACE FUNCTION incident_counts_by_month()
+RETURNS TABLE (month DATE, issue_type_id INTEGER, type_name VARCHAR, issue_count BIGINT)
+LANGUAGE sql STABLE
+AS $$
+    SELECT
+        date_trunc('month', c.first_seen)::DATE AS month,
+        c.issue_type_id,
+        t.name AS type_name,
+        COUNT(*) AS issue_count
+    FROM incidents c
+    LEFT JOIN issue_types t ON t.id = c.issue_type_id
+    GROUP BY 1, c.issue_type_id, t.name
+    ORDER BY 1;
+$$;
@@ -0,0 +1,123 @@
+-- Downscaled WebP copies of issue photos for the list, map and detail views
+-- Requires PostGIS (migration 011)
+
+-- Storage path and public URL of each derivative; NULL until it is generated
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS thumbnail_path TEXT;
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS thumbnail_url TEXT;
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS display_path TEXT;
+ALTER TABLE issues ADD COLUMN IF NOT EXISTS display_url TEXT;
+
+-- Thumbnail of the incident's first report
+ALTER TABLE incidents ADD COLUMN IF NOT EXISTS thumbnail_url TEXT;
+
+SET search_path = public, extensions;
+
+-- Map lookups now also return the thumbnail; the result type changes, so
+-- the functions from migration 011 are dropped first
+DROP FUNCTION IF EXISTS issues_in_bbox(DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, TIMESTAMP, TIMESTAMP, INTEGER);
+DROP FUNCTION IF EXISTS issues_nearby(DOUBLE PRECISION, DOUBLE PRECISION, DOUBLE PRECISION, INTEGER, INTEGER);
+
+CREATE OR REPLACE FUNCTION issues_in_bbox(
+    min_lat DOUBLE PRECISION,
+    min_lng DOUBLE PRECISION,
+    max_lat DOUBLE PRECISION,
+    max_lng DOUBLE PRECISION,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL,
+    max_rows INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    id INTEGER,
+    issue_type_id INTEGER,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    "timestamp" TIMESTAMP,
+    image_url TEXT,
+    thumbnail_url TEXT
+)
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    SELECT i.id, i.issue_type_id, i.latitude::DOUBLE PRECISION, i.longitude::DOUBLE PRECISION, i.timestamp, i.image_url, i.thumbnail_url
+    FROM issues i
+    WHERE i.extraction_error = FALSE
+      AND i.location::GEOMETRY && ST_MakeEnvelope(min_lng, min_lat, max_lng, max_lat, 4326)
+      AND (filter_issue_type_id IS NULL OR i.issue_type_id = filter_issue_type_id)
+      AND (filter_date_from IS NULL OR i.timestamp >= filter_date_from)
+      AND (filter_date_to IS NULL OR i.timestamp <= filter_date_to)
+    ORDER BY i.id DESC
+    LIMIT max_rows;
+$$;
+
+CREATE OR REPLACE FUNCTION issues_nearby(
+    lat DOUBLE PRECISION,
+    lng DOUBLE PRECISION,
+    radius_m DOUBLE PRECISION DEFAULT NULL,
+    max_rows INTEGER DEFAULT 20,
+    filter_issue_type_id INTEGER DEFAULT NULL
+)
+RETURNS TABLE (
+    id INTEGER,
+    issue_type_id INTEGER,
+    latitude DOUBLE PRECISION,
+    longitude DOUBLE PRECISION,
+    "timestamp" TIMESTAMP,
+    image_url TEXT,
+    thumbnail_url TEXT,
+    distance_m DOUBLE PRECISION
+)
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    SELECT
+        i.id, i.issue_type_id, i.latitude::DOUBLE PRECISION, i.longitude::DOUBLE PRECISION, i.timestamp, i.image_url, i.thumbnail_url,
+        ST_Distance(i.location, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::GEOGRAPHY) AS distance_m
+    FROM issues i
+    WHERE i.extraction_error = FALSE
+      AND i.location IS NOT NULL
+      AND (radius_m IS NULL OR ST_DWithin(i.location, ST_SetSRID(ST_MakePoint(lng, lat), 4326)::GEOGRAPHY, radius_m))
+      AND (filter_issue_type_id IS NULL OR i.issue_type_id = filter_issue_type_id)
+    ORDER BY i.location <-> ST_SetSRID(ST_MakePoint(lng, lat), 4326)::GEOGRAPHY
+    LIMIT max_rows;
+$$;
+
+-- Vector tile features carry the thumbnail for the map popups
+CREATE OR REPLACE FUNCTION issue_tile(
+    z INTEGER,
+    x INTEGER,
+    y INTEGER,
+    filter_issue_type_id INTEGER DEFAULT NULL,
+    filter_date_from TIMESTAMP DEFAULT NULL,
+    filter_date_to TIMESTAMP DEFAULT NULL
+)
+RETURNS BYTEA
+LANGUAGE sql STABLE
+SET search_path = public, extensions
+AS $$
+    WITH bounds AS (
+        SELECT ST_TileEnvelope(z, x, y) AS geom
+    ),
+    features AS (
+        SELECT
+            i.id,
+            i.issue_type_id,
+            t.name AS type,
+            to_char(i.timestamp, 'YYYY-MM-DD"T"HH24:MI:SS') AS timestamp,
+            i.image_url,
+            i.thumbnail_url,
+            ST_AsMVTGeom(ST_Transform(i.location::GEOMETRY, 3857), bounds.geom) AS geom
+        FROM bounds, issues i
+        LEFT JOIN issue_types t ON t.id = i.issue_type_id
+        WHERE i.extraction_error = FALSE
+          AND i.location::GEOMETRY && ST_Transform(bounds.geom, 4326)
+          AND (filter_issue_type_id IS NULL OR i.issue_type_id = filter_issue_type_id)
+          AND (filter_date_from IS NULL OR i.timestamp >= filter_date_from)
+          AND (filter_date_to IS NULL OR i.timestamp <= filter_date_to)
+    )
+    SELECT COALESCE(ST_AsMVT(features, 'issues', 4096, 'geom'), ''::BYTEA)
+    FROM features
+    WHERE geom IS NOT NULL;
+$$;
+
+RESET search_path;
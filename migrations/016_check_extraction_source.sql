@@ -0,0 +1,13 @@
+-- Restrict issues.extraction_source to the values the upload pipeline writes
+
+-- 'exif'         coordinates and timestamp from the camera metadata
+-- 'gemini'       read from the photo's watermark by the model
+-- 'exif+gemini'  watermark reading completed with EXIF fields
+-- 'duplicate'    copied from the stored issue this photo is a near-duplicate of (migration 013)
+-- NULL           extraction failed before any tier ran
+ALTER TABLE issues DROP CONSTRAINT IF EXISTS issues_extraction_source_check;
+ALTER TABLE issues ADD CONSTRAINT issues_extraction_source_check
+    CHECK (extraction_source IN ('exif', 'gemini', 'exif+gemini', 'duplicate'));
+
+COMMENT ON COLUMN issues.extraction_source IS
+    'Source of the coordinates and timestamp: exif, gemini, exif+gemini or duplicate (NULL if extraction failed)';
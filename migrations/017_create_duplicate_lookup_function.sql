@@ -0,0 +1,48 @@
+-- Closest stored near-duplicate of a perceptual hash, compared in the database
+
+-- The caller passes, for each of the four bands, every 16-bit value within
+-- max_distance / 4 bits of the new hash's band (migration 013). Issues with
+-- such a band are found through the band indexes, and all of them are
+-- compared on the full hash, so an older near-duplicate is never missed
+-- because newer issues share a band.
+CREATE OR REPLACE FUNCTION find_duplicate_issue(
+    target BIGINT,
+    max_distance INTEGER,
+    band0 INTEGER[],
+    band1 INTEGER[],
+    band2 INTEGER[],
+    band3 INTEGER[]
+)
+RETURNS TABLE (
+    id INTEGER,
+    phash BIGINT,
+    duplicate_of INTEGER,
+    latitude NUMERIC,
+    longitude NUMERIC,
+    "timestamp" TIMESTAMP,
+    extraction_source VARCHAR,
+    distance INTEGER
+)
+LANGUAGE sql STABLE
+AS $$
+    SELECT *
+    FROM (
+        SELECT
+            i.id,
+            i.phash,
+            i.duplicate_of,
+            i.latitude,
+            i.longitude,
+            i.timestamp,
+            i.extraction_source,
+            bit_count((i.phash # target)::bit(64))::INTEGER AS distance
+        FROM issues i
+        WHERE i.phash_b0 = ANY(band0)
+           OR i.phash_b1 = ANY(band1)
+           OR i.phash_b2 = ANY(band2)
+           OR i.phash_b3 = ANY(band3)
+    ) candidates
+    WHERE candidates.distance <= max_distance
+    ORDER BY candidates.distance, candidates.id
+    LIMIT 1;
+$$;
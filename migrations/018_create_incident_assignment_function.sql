@@ -0,0 +1,146 @@
+-- Incident lookup and creation in one locked database call, and report
+-- counts that leave out flagged near-duplicates
+
+-- Find the closest incident of the same type within max_distance_m metres
+-- and window_days days of a report, or start one at the report's location.
+-- The caller passes the report's grid cell and the 3x3 block of cells
+-- around it (app/utils/incidents.py).
+--
+-- Transaction-level advisory locks on (issue_type_id, cell) are taken for
+-- the whole block, in a fixed order so two calls cannot deadlock. Two
+-- reports that could end up in one incident lock each other's cell, so
+-- their lookups and inserts run one after the other across every process,
+-- and the locks are released as soon as the call returns.
+CREATE OR REPLACE FUNCTION find_or_create_incident(
+    report_issue_type_id INTEGER,
+    report_lat DOUBLE PRECISION,
+    report_lng DOUBLE PRECISION,
+    report_timestamp TIMESTAMP,
+    report_cell VARCHAR,
+    cells VARCHAR[],
+    max_distance_m DOUBLE PRECISION,
+    window_days INTEGER,
+    report_image_url TEXT,
+    report_thumbnail_url TEXT DEFAULT NULL
+)
+RETURNS TABLE (incident_id INTEGER, created BOOLEAN)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    time_window INTERVAL := make_interval(days => window_days);
+    found_id INTEGER;
+    cell_key INTEGER;
+BEGIN
+    FOR cell_key IN
+        SELECT DISTINCT hashtext(cell) FROM unnest(cells || report_cell) AS cell ORDER BY 1
+    LOOP
+        PERFORM pg_advisory_xact_lock(report_issue_type_id, cell_key);
+    END LOOP;
+
+    SELECT c.id INTO found_id
+    FROM (
+        SELECT
+            i.id,
+            -- Great-circle (haversine) distance in metres
+            2 * 6371000 * asin(sqrt(
+                power(sin(radians(i.latitude::DOUBLE PRECISION - report_lat) / 2), 2)
+                + cos(radians(report_lat)) * cos(radians(i.latitude::DOUBLE PRECISION))
+                  * power(sin(radians(i.longitude::DOUBLE PRECISION - report_lng) / 2), 2)
+            )) AS distance
+        FROM incidents i
+        WHERE i.issue_type_id = report_issue_type_id
+          AND i.grid_cell = ANY(cells)
+          AND i.last_seen >= report_timestamp - time_window
+          AND i.first_seen <= report_timestamp + time_window
+    ) c
+    WHERE c.distance <= max_distance_m
+    ORDER BY c.distance, c.id
+    LIMIT 1;
+
+    IF found_id IS NOT NULL THEN
+        RETURN QUERY SELECT found_id, FALSE;
+        RETURN;
+    END IF;
+
+    -- Report count and time span are kept by the issues triggers
+    INSERT INTO incidents (issue_type_id, grid_cell, latitude, longitude, first_seen, last_seen, image_url, thumbnail_url)
+    VALUES (report_issue_type_id, report_cell, report_lat, report_lng, report_timestamp, report_timestamp,
+            report_image_url, report_thumbnail_url)
+    RETURNING id INTO found_id;
+
+    RETURN QUERY SELECT found_id, TRUE;
+END;
+$$;
+
+-- Near-duplicates (duplicate_of set, migration 013) keep their incident_id
+-- but are not counted as reports of it
+
+CREATE OR REPLACE FUNCTION recount_incidents(incident_ids INTEGER[])
+RETURNS VOID
+LANGUAGE sql
+AS $$
+    -- Every given incident is updated, so one left with only duplicates drops to 0
+    UPDATE incidents c
+    SET report_count = s.report_count,
+        first_seen = COALESCE(s.first_seen, c.first_seen),
+        last_seen = COALESCE(s.last_seen, c.last_seen)
+    FROM (
+        SELECT ids.id AS incident_id, COUNT(i.id) AS report_count, MIN(i.timestamp) AS first_seen, MAX(i.timestamp) AS last_seen
+        FROM unnest(incident_ids) AS ids(id)
+        LEFT JOIN issues i ON i.incident_id = ids.id AND i.duplicate_of IS NULL
+        GROUP BY ids.id
+    ) s
+    WHERE c.id = s.incident_id;
+
+    DELETE FROM incidents c
+    WHERE c.id = ANY(incident_ids)
+      AND NOT EXISTS (SELECT 1 FROM issues i WHERE i.incident_id = c.id);
+$$;
+
+CREATE OR REPLACE FUNCTION incidents_after_issue_insert()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Incremental, so concurrent uploads into one incident do not overwrite each other
+    UPDATE incidents c
+    SET report_count = c.report_count + n.report_count,
+        first_seen = LEAST(c.first_seen, n.first_seen),
+        last_seen = GREATEST(c.last_seen, n.last_seen)
+    FROM (
+        SELECT incident_id, COUNT(*) AS report_count, MIN(timestamp) AS first_seen, MAX(timestamp) AS last_seen
+        FROM new_rows
+        WHERE incident_id IS NOT NULL
+          AND duplicate_of IS NULL
+        GROUP BY incident_id
+    ) n
+    WHERE c.id = n.incident_id;
+    RETURN NULL;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION incidents_after_issue_update()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    -- Only rows that moved to another incident, changed their timestamp or
+    -- were flagged as (or cleared of being) a duplicate matter
+    PERFORM recount_incidents(ARRAY(
+        SELECT DISTINCT unnest(ARRAY[o.incident_id, n.incident_id])
+        FROM old_rows o
+        JOIN new_rows n ON n.id = o.id
+        WHERE o.incident_id IS DISTINCT FROM n.incident_id
+           OR (n.incident_id IS NOT NULL AND o.timestamp IS DISTINCT FROM n.timestamp)
+           OR (n.incident_id IS NOT NULL AND (o.duplicate_of IS NULL) <> (n.duplicate_of IS NULL))
+    ));
+    RETURN NULL;
+END;
+$$;
+
+-- Bring existing counts in line with the rules above. Incidents are not
+-- deleted here: ones started by an upload in progress have no reports yet.
+UPDATE incidents c
+SET report_count = (
+    SELECT COUNT(*) FROM issues i WHERE i.incident_id = c.id AND i.duplicate_of IS NULL
+);
@@ -0,0 +1,112 @@
+"""
+Peak memory of the streaming issue export versus building it in one piece.
+
+The repository is replaced by one that makes up issues page by page, so no
+database is needed. Each export format is consumed the way a download would
+be, and the peak Python heap (plus pyarrow's pool for Parquet) is compared
+with the old export, which fetched every issue and built the CSV as one
+string. The streaming figures should stay flat as --issues grows.
+
+    python scripts/bench_export_memory.py [--issues 200000] [--page-size 1000]
+"""
+import argparse
+import csv
+import io
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import app.utils.issue_export as issue_export
+
+
+TYPE_NAMES = {1: 'Gropi in asfalt', 2: 'Gunoi', 3: 'Trotuar degradat'}
+
+
+def _issue(n):
+    return {
+        'id': n,
+        'issue_type_id': n % 3 + 1,
+        'latitude': 44.4 + (n % 1000) / 10000,
+        'longitude': 26.0 + (n % 777) / 10000,
+        'timestamp': f'2024-{n % 12 + 1:02d}-{n % 28 + 1:02d}T09:50:00'
+    }
+
+
+class FakeRepository:
+    def __init__(self, issues):
+        self.issues = issues
+
+    def export_pages(self, filters, page_size):
+        for start in range(1, self.issues + 1, page_size):
+            yield [_issue(n) for n in range(start, min(start + page_size, self.issues + 1))]
+
+
+def _all_at_once(issues):
+    """The export before streaming: every issue fetched, then one CSV string."""
+    rows = [{
+        'id': issue['id'],
+        'type': TYPE_NAMES.get(issue['issue_type_id'], 'Unknown'),
+        'latitude': issue['latitude'],
+        'longitude': issue['longitude'],
+        'timestamp': issue['timestamp']
+    } for issue in (_issue(n) for n in range(1, issues + 1))]
+
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=issue_export.EXPORT_FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    data = output.getvalue()
+    yield data
+
+
+def _measure(chunks):
+    """Consume an export like a client download; returns (bytes sent, peak MiB)."""
+    pool = None
+    try:
+        import pyarrow
+        pool = pyarrow.default_memory_pool()
+        arrow_base = pool.bytes_allocated()
+    except ImportError:
+        arrow_base = 0
+    arrow_peak = 0
+
+    tracemalloc.start()
+    size = 0
+    for chunk in chunks:
+        size += len(chunk)
+        if pool is not None:
+            arrow_peak = max(arrow_peak, pool.bytes_allocated() - arrow_base)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, (peak + arrow_peak) / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--issues', type=int, default=200000, help='issues to export')
+    parser.add_argument('--page-size', type=int, default=1000, help='EXPORT_PAGE_SIZE')
+    args = parser.parse_args()
+
+    issue_export.get_repository = lambda: FakeRepository(args.issues)
+    issue_export.get_issue_type_names = lambda: TYPE_NAMES
+
+    variants = [('csv, all at once', lambda: _all_at_once(args.issues))]
+    for name, (generator, _, _) in issue_export.EXPORT_FORMATS.items():
+        if name == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                continue
+        variants.append((f'{name}, streamed', lambda generator=generator: generator({}, args.page_size)))
+
+    print(f"{args.issues} issues, pages of {args.page_size}")
+    print(f"{'export':<20} {'size MiB':>9} {'peak MiB':>9}")
+    for name, make_chunks in variants:
+        size, peak = _measure(make_chunks())
+        print(f"{name:<20} {size / 2 ** 20:>9.1f} {peak:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
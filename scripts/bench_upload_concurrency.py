@@ -0,0 +1,123 @@
+"""
+Upload pipeline throughput at different concurrency levels.
+
+Gemini extraction and storage uploads are replaced by sleeps of typical
+latency, so the numbers show how well the thread pool overlaps the network
+wait, not how fast any real service is. Throughput should grow close to
+linearly up to the worker count and flatten once the files run out.
+
+    python scripts/bench_upload_concurrency.py [--files 32] [--workers 1,2,4,8]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+# Only the stubs below talk to "services"; nothing real is contacted
+os.environ.setdefault('SUPABASE_URL', 'http://localhost.invalid')
+os.environ.setdefault('SUPABASE_SERVICE_KEY', 'bench.bench.bench')
+os.environ.setdefault('RESPONSE_CACHE_BACKEND', 'none')
+os.environ['DUPLICATE_DETECTION'] = 'off'
+os.environ['INCIDENT_MERGING'] = 'false'
+
+from PIL import Image
+from werkzeug.datastructures import FileStorage
+
+from app import create_app
+import app.utils.upload_pipeline as upload_pipeline
+
+
+def _stub_services(extract_latency, storage_latency):
+    def extract_metadata(image):
+        time.sleep(extract_latency)
+        return {'latitude': 44.4268, 'longitude': 26.1025, 'timestamp': None, 'raw_text': None, 'source': 'gemini'}
+
+    def upload_image_to_storage(file, filename=None, source_name=None, content_type=None, upsert=False):
+        time.sleep(storage_latency)
+        return {'success': True, 'url': 'https://storage.invalid/x.jpg', 'path': 'x.jpg', 'error': None}
+
+    def store_derivatives(stream, image_path, config):
+        time.sleep(storage_latency)
+        return {}
+
+    class Result:
+        def __init__(self, rows):
+            self.data = [{'id': i + 1} for i in range(len(rows))]
+
+    class Query:
+        def __init__(self, rows):
+            self.rows = rows if isinstance(rows, list) else [rows]
+
+        def execute(self):
+            time.sleep(0.02)
+            return Result(self.rows)
+
+    class Table:
+        def insert(self, rows):
+            return Query(rows)
+
+    class Client:
+        def table(self, name):
+            return Table()
+
+    upload_pipeline.extract_metadata = extract_metadata
+    upload_pipeline.upload_image_to_storage = upload_image_to_storage
+    upload_pipeline.store_derivatives = store_derivatives
+    upload_pipeline.get_db = lambda: Client()
+    upload_pipeline.bump_data_version = lambda: None
+
+
+def _sample_image():
+    output = io.BytesIO()
+    Image.new('RGB', (1600, 1200), (120, 140, 160)).save(output, format='JPEG', quality=85)
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--files', type=int, default=32, help='files per batch')
+    parser.add_argument('--workers', default='1,2,4,8', help='comma-separated concurrency levels')
+    parser.add_argument('--extract-latency', type=float, default=0.5, help='seconds per Gemini call')
+    parser.add_argument('--storage-latency', type=float, default=0.15, help='seconds per storage upload')
+    args = parser.parse_args()
+
+    _stub_services(args.extract_latency, args.storage_latency)
+    data = _sample_image()
+    app = create_app()
+
+    # Pipeline logging is per file; keep the table readable
+    stdout = sys.stdout
+
+    print(f"{args.files} files, extraction {args.extract_latency}s, storage {args.storage_latency}s")
+    print(f"{'workers':>8} {'seconds':>8} {'files/s':>8} {'speedup':>8}")
+    baseline = None
+    for workers in [int(w) for w in args.workers.split(',')]:
+        items = [{
+            'file': FileStorage(io.BytesIO(data), filename=f'bench_{i}.jpg'),
+            'filename': f'bench_{i}.jpg',
+            'issue_type_id': 1
+        } for i in range(args.files)]
+
+        with app.app_context():
+            sys.stdout = io.StringIO()
+            try:
+                start = time.perf_counter()
+                result = upload_pipeline.process_files(items, max_workers=workers)
+                elapsed = time.perf_counter() - start
+            finally:
+                sys.stdout = stdout
+
+        if result['failed']:
+            print(f"{workers:>8} {result['failed']} file(s) failed: {result['failed_details'][0]['error']}")
+            continue
+
+        throughput = args.files / elapsed
+        baseline = baseline or throughput
+        print(f"{workers:>8} {elapsed:>8.2f} {throughput:>8.1f} {throughput / baseline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
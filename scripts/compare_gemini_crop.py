@@ -0,0 +1,117 @@
+"""
+Gemini watermark extraction on the cropped band versus the full frame.
+
+Every photo is sent to Gemini twice, once as the downscaled watermark band
+(GEMINI_CROP_*) and once as the original frame, and the script reports
+payload size, latency and whether the band gave the same coordinates and
+timestamp as the full frame. Unlike the other benchmarks this calls the real
+model, so GCP_PROJECT_ID, GCP_LOCATION and credentials must be set.
+
+    python scripts/compare_gemini_crop.py [sample-pics] [--fraction 0.35]
+
+Enable GEMINI_CROP_ENABLED only if the band matches the full frame on a
+representative set of uploads.
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from app.utils.gemini_extractor import _generate, get_model
+from app.utils.image_preprocess import crop_watermark_band
+
+
+# Coordinates closer than this (in degrees, ~10 m) count as the same reading
+COORDINATE_TOLERANCE = 0.0001
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def _extract(model, payload):
+    """Run one extraction, returning (result, seconds) with its logging suppressed."""
+    empty = {'latitude': None, 'longitude': None, 'timestamp': None, 'raw_text': None}
+    stdout = sys.stdout
+    sys.stdout = io.StringIO()
+    try:
+        start = time.perf_counter()
+        result = _generate(model, payload, empty)
+        return result, time.perf_counter() - start
+    finally:
+        sys.stdout = stdout
+
+
+def _found(result):
+    return result['latitude'] is not None and result['longitude'] is not None
+
+
+def _same(band, full):
+    """Whether the band reading agrees with the full-frame one."""
+    if not _found(band) or not _found(full):
+        return _found(band) == _found(full)
+    return (abs(band['latitude'] - full['latitude']) <= COORDINATE_TOLERANCE
+            and abs(band['longitude'] - full['longitude']) <= COORDINATE_TOLERANCE
+            and band['timestamp'] == full['timestamp'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?', default='sample-pics', help='folder of photos to compare')
+    parser.add_argument('--fraction', type=float, default=0.35, help='GEMINI_CROP_FRACTION')
+    parser.add_argument('--max-dimension', type=int, default=1280, help='GEMINI_MAX_DIMENSION')
+    parser.add_argument('--quality', type=int, default=85, help='GEMINI_JPEG_QUALITY')
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.directory, name) for name in os.listdir(args.directory)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        sys.exit(f"No photos in {args.directory}")
+
+    model = get_model()
+
+    print(f"{'photo':<40} {'band KB':>8} {'full KB':>8} {'band s':>7} {'full s':>7}  result")
+    band_times, full_times, band_sizes, full_sizes = [], [], [], []
+    matches = band_only_misses = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            image_bytes = f.read()
+        band_bytes = crop_watermark_band(image_bytes, args.fraction, args.max_dimension, args.quality)
+
+        band, band_time = _extract(model, band_bytes)
+        full, full_time = _extract(model, image_bytes)
+
+        same = _same(band, full)
+        matches += same
+        # Missing coordinates on the band only cost a second call (full-frame fallback);
+        # different coordinates would be stored as wrong data
+        band_only_misses += not _found(band) and _found(full)
+        if same:
+            verdict = 'same'
+        elif not _found(band):
+            verdict = 'band missed, fallback needed'
+        else:
+            verdict = f"DIFFERENT band={band['latitude']},{band['longitude']} full={full['latitude']},{full['longitude']}"
+
+        band_times.append(band_time)
+        full_times.append(full_time)
+        band_sizes.append(len(band_bytes))
+        full_sizes.append(len(image_bytes))
+        print(f"{os.path.basename(path)[:40]:<40} {len(band_bytes) / 1024:>8.0f} {len(image_bytes) / 1024:>8.0f} "
+              f"{band_time:>7.2f} {full_time:>7.2f}  {verdict}")
+
+    print()
+    print(f"Photos:             {len(paths)}")
+    print(f"Same result:        {matches}/{len(paths)}")
+    print(f"Band missed:        {band_only_misses} (full-frame fallback)")
+    print(f"Median payload:     {statistics.median(band_sizes) / 1024:.0f} KB band, "
+          f"{statistics.median(full_sizes) / 1024:.0f} KB full")
+    print(f"Median latency:     {statistics.median(band_times):.2f}s band, {statistics.median(full_times):.2f}s full")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Background upload worker.
+
+Drains the upload job queue: runs extraction, storage upload and database
+insert for every queued job. Run one or more of these next to the web
+workers (they must share UPLOAD_QUEUE_PATH and UPLOAD_SPOOL_DIR):
+
+    python worker.py
+"""
+import sys
+import time
+import traceback
+
+from app import create_app
+from app.utils.job_queue import claim_next_job, update_file_status, finish_job, requeue_stale_jobs
+from app.utils.upload_pipeline import process_files
+
+
+def _requeue_stale(app):
+    """Put jobs of workers that died mid-job back on the queue."""
+    try:
+        requeued = requeue_stale_jobs(app.config['UPLOAD_JOB_STALE_SECONDS'])
+        if requeued:
+            print(f"Requeued {requeued} stale upload job(s)", file=sys.stderr)
+    except Exception:
+        traceback.print_exc()
+
+
+def run_worker(app):
+    """Poll the queue forever, processing one job at a time."""
+    poll_interval = app.config['UPLOAD_WORKER_POLL_INTERVAL']
+    stale_check_interval = app.config['UPLOAD_JOB_STALE_CHECK_INTERVAL']
+    next_stale_check = 0
+
+    print("Upload worker started", file=sys.stderr)
+
+    while True:
+        with app.app_context():
+            # Checked periodically rather than only at startup, so a crashed
+            # worker's job is picked up even if no worker restarts later
+            if time.monotonic() >= next_stale_check:
+                _requeue_stale(app)
+                next_stale_check = time.monotonic() + stale_check_interval
+
+            job = claim_next_job()
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+
+            job_id = job['id']
+            items = job['items']
+            print(f"Processing upload job {job_id} ({len(items)} files)", file=sys.stderr)
+
+            def on_progress(idx, status, error):
+                update_file_status(job_id, items[idx]['idx'], status, error)
+
+            try:
+                results = process_files(items, on_progress=on_progress)
+                print(f"✓ Job {job_id} done: {results['success']} succeeded, {results['failed']} failed", file=sys.stderr)
+            except Exception:
+                traceback.print_exc()
+            finally:
+                finish_job(job_id)
+
+
+if __name__ == '__main__':
+    run_worker(create_app())